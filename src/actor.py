@@ -20,9 +20,14 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
-from model_spec import DPS, UPS
+from model_spec import DPS, UPS, FAST_FORWARD, CHECKPOINT_SECONDS, CHECKPOINT_FILE, TRACE_TICKS, TRACE_FILE, \
+    trace_request
 from utils import timed_call
 from brain import Brain
+from checkpoint import Checkpointer
+from transport import StatePublisher
+from subscription import Subscription
+from recorder import Recorder
 from constants import *
 import time
 import logging
@@ -54,7 +59,13 @@ class Actor:
         self.updates_per_second = updates_per_second
         self.alive = False
         self.time_alive = 0
-        self.state = None
+        self.publisher = StatePublisher(self.brain)     # state for the monitor, in shared memory (see transport.py)
+        self.fast_forward = FAST_FORWARD    # advance settled stretches in closed form (see advance())
+        self.ticks_fast_forwarded = 0
+        # periodic checkpoints of the actor's state, written in the background (see checkpoint.py)
+        self.checkpointer = Checkpointer(self, CHECKPOINT_FILE, CHECKPOINT_SECONDS) if CHECKPOINT_SECONDS else None
+        # trace of selected variables on every tick (see recorder.py)
+        self.recorder = Recorder(self.brain, trace_request, TRACE_FILE, TRACE_TICKS) if TRACE_TICKS else None
 
         # node_contents = [module.on_content_request() for module in self.brain.modules]
         # logging.info(pformat(node_contents, compact=False, width=600))
@@ -68,6 +79,12 @@ class Actor:
 
     def _die(self):
         self.stop_profiling()
+        if self.checkpointer is not None:
+            self.checkpointer.wait()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.brain.stop_workers()
+        self.publisher.close()
         # stop main loop in live()
         self.alive = False
 
@@ -99,6 +116,9 @@ class Actor:
                     else:
                         logging.info('***** "pause" message received. *****')
                     paused = not paused
+                elif isinstance(message, Subscription):
+                    logging.info('***** "subscription" message received. *****')
+                    self.publisher.subscribe(message)
 
             if paused:
                 # print('paused\n')
@@ -109,6 +129,7 @@ class Actor:
             time_for_sleep = 0
             time_for_sensors = 0
             time_for_state_dump = 0
+            time_for_trace = 0
 
             for update in range(self.updates_per_second):
 
@@ -120,6 +141,12 @@ class Actor:
                 t_brain = timed_call(self.brain.on_tick)
                 time_for_brain += t_brain
 
+                # all cycles: record the trace
+                t_trace = 0
+                if self.recorder is not None:
+                    t_trace = timed_call(self.recorder.on_tick, tick=self.time_alive)
+                    time_for_trace += t_trace
+
                 # last cycle: send brain state to monitor
                 t_state_dump = 0
                 if update % (UPS / DPS) == 0:
@@ -127,7 +154,7 @@ class Actor:
                     time_for_state_dump += t_state_dump
 
                 # wait for end of cycle
-                time_left_in_cycle = time_per_cycle - t_brain - t_state_dump
+                time_left_in_cycle = time_per_cycle - t_brain - t_trace - t_state_dump
                 if time_left_in_cycle > 0:
                     time.sleep(time_left_in_cycle / NS)
                 else:
@@ -137,17 +164,57 @@ class Actor:
                 # time alive measured in cycles (= seconds * UPS)
                 self.time_alive += 1
 
+            # checkpoint, if due
+            time_for_checkpoint = 0
+            if self.checkpointer is not None:
+                time_for_checkpoint = timed_call(self.checkpointer.on_second)
+
             # log times
             logging.info(f"sensor time =\t{time_for_sensors / NS_PER_MS: 8.2f} ms")
             logging.info(f"brain time  =\t{time_for_brain / NS_PER_MS: 8.2f} ms")
+            logging.info(f"trace time  =\t{time_for_trace / NS_PER_MS: 8.2f} ms")
             logging.info(f"sleep time  =\t{time_for_sleep / NS_PER_MS: 8.2f} ms")
             logging.info(f"log time    =\t{time_for_state_dump / NS_PER_MS: 8.2f} ms")
+            logging.info(f"checkpoint  =\t{time_for_checkpoint / NS_PER_MS: 8.2f} ms")
+
+    def advance(self, ticks: int):
+        """
+        Advance the brain by a number of ticks, without pacing or state dumps. With fast_forward set (FAST_FORWARD),
+        stretches over which the brain has settled are advanced in closed form (see Brain.fast_forward()) instead of
+        tick by tick.
+        """
+        done = 0
+        while done < ticks:
+            self.brain.on_tick()
+            done += 1
+            if self.recorder is not None:
+                self.recorder.on_tick(self.time_alive + done - 1)
+            if self.fast_forward and done < ticks:
+                skipped = self.brain.fast_forward(ticks - done)
+                self.ticks_fast_forwarded += skipped
+                done += skipped
+                if skipped and self.recorder is not None:
+                    # the state at the end of the stretch: the ticks in between are not recorded
+                    self.recorder.on_tick(self.time_alive + done - 1)
+        self.time_alive += ticks
+
+    def train(self, ticks: int):
+        """
+        Run the brain for a number of ticks as fast as possible, with the trainer updating the sensors on the first
+        tick of each second of model time, and any checkpoints at the end of a second, as in live().
+        """
+        while ticks > 0:
+            update = self.time_alive % self.updates_per_second
+            if update == 0 and self.trainer is not None:
+                self.trainer.on_tick()
+            stretch = min(ticks, self.updates_per_second - update)
+            self.advance(stretch)
+            ticks -= stretch
+            if self.checkpointer is not None and self.time_alive % self.updates_per_second == 0:
+                self.checkpointer.on_second()
 
     def _send_state_to_monitor(self, delta_t):
 
-        self.state = self.brain.on_state_dump()
-        self.state[TIME_ALIVE_CYCLES] = self.time_alive
-        # logging.info('++++++++++++ STATE ++++++++++++')
-        # logging.info(pformat(self.state, compact=False, width=600))
-        # logging.info('++++++++++++ STATE ++++++++++++')
-        self.pipe.send(self.state)
+        handshake = self.publisher.publish(self.time_alive)
+        if handshake is not None:
+            self.pipe.send(handshake)
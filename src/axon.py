@@ -20,33 +20,36 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
+from functools import cached_property
 from abs_events import AbsUpdatable
 from operator import add
-import itertools
 from constants import *
 
 
 class Axon(AbsUpdatable):
 
-    axon_count = 0
-    _axon_counter = itertools.count(1)
-
-    def __init__(self, parent, axon_spec):
+    def __init__(self, parent, axon_spec, locations: list = None):
         """
         Axon class creates axons from the specifications in models.py.
+
+        :param locations: absolute locations of the nodes that the axon crosses, if already calculated
+                          (see templates.py)
         """
-        # keep count of created objects
-        Axon.axon_count = next(Axon._axon_counter)
         # parent cell
         self.parent = parent
-        # key is unique for all axons
-        self.key = f'ax-{Axon.axon_count:02d}'
+        # id, unique among the axons of the brain
+        self.id = parent.module.brain.ids.next(AXON)
         # calculate absolute locations of host nodes in the module
         # element-wise addition of location tuples
-        self.locations = [parent.location] + \
-                         [tuple(map(add, loc, parent.location)) for loc in axon_spec['relative_locs']]
+        self.locations = locations if locations is not None else \
+            [parent.location] + [tuple(map(add, loc, parent.location)) for loc in axon_spec['relative_locs']]
         self.exciter = axon_spec[EXCITER]
         self.active = False
+        self.spines = []    # spines fed by this axon
+
+    @cached_property
+    def key(self) -> str:
+        return f'ax-{self.id:02d}'
 
     def on_state_dump(self):
         return {
@@ -58,4 +61,8 @@ class Axon(AbsUpdatable):
         }
 
     def on_tick(self):
+        if self.active != self.parent.active and self.parent.module.event_driven:
+            # wake the spines resting on this axon's previous state
+            for spine in self.spines:
+                spine.dendrite.awake.add(spine)
         self.active = self.parent.active
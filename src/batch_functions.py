@@ -0,0 +1,193 @@
+"""
+    Program: ALBERT
+    Module: batch_functions.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Array (batch) versions of the user's update functions, for the array engine.
+
+Run 'python batch_functions.py' to check each *_batch function in model_spec.UserFunctions against its scalar version.
+"""
+
+import logging
+
+import numpy as np
+
+from model_spec import UserFunctions, REST_POTENTIAL, FIRING_POTENTIAL, MIN_LENGTH, MAX_LENGTH, \
+    MIN_STRENGTH, MAX_STRENGTH, DV_INHIBIT
+from topology import Segments
+
+# update functions that have array versions
+NAMES = ['update_cell', 'update_dendrite', 'update_spine', 'update_synapse', 'update_node']
+
+
+class BatchFunctions:
+    """
+    The array versions of a set of user functions: user_functions.<name>_batch where it is defined,
+    otherwise user_functions.<name> applied element by element.
+    """
+
+    def __init__(self, user_functions=UserFunctions):
+        self.wrapped = []   # names of the functions that only have scalar versions
+        for name in NAMES:
+            batch = getattr(user_functions, name + '_batch', None)
+            if batch is None:
+                batch = FALLBACKS[name](getattr(user_functions, name))
+                self.wrapped.append(name)
+            setattr(self, name, batch)
+        # closed form of repeated spine and synapse updates, if the user functions provide one
+        self.fast_forward = getattr(user_functions, 'fast_forward_batch', None)
+        if self.wrapped:
+            logging.info(f"scalar update functions applied element by element: {', '.join(self.wrapped)}")
+
+
+class Item:
+    """ stand-in for a component, carrying the attributes read by a scalar update function """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+def segment_bounds(segments: Segments):
+    return zip(segments.offsets[:-1], segments.offsets[1:])
+
+
+def cell_fallback(update_cell):
+    def update_cell_batch(dendrite_potential, segments, injected_potential, firing_threshold):
+        results = [update_cell([Item(potential=value) for value in dendrite_potential[start:stop]],
+                               injected_potential[index], firing_threshold[index])
+                   for index, (start, stop) in enumerate(segment_bounds(segments))]
+        potential, active = zip(*results) if results else ((), ())
+        return np.array(potential, dtype=float), np.array(active, dtype=bool)
+    return update_cell_batch
+
+
+def dendrite_fallback(update_dendrite):
+    def update_dendrite_batch(spine_potential, segments):
+        return np.array([update_dendrite([Item(potential=value) for value in spine_potential[start:stop]])
+                         for start, stop in segment_bounds(segments)], dtype=float)
+    return update_dendrite_batch
+
+
+def spine_fallback(update_spine):
+    def update_spine_batch(axon_active, synapse_potential, length, connected, potential):
+        results = [update_spine(Item(active=values[0]), Item(potential=values[1]), *values[2:])
+                   for values in zip(axon_active.tolist(), synapse_potential.tolist(), length.tolist(),
+                                     connected.tolist(), potential.tolist())]
+        length, connected, potential = zip(*results) if results else ((), (), ())
+        return np.array(length, dtype=float), np.array(connected, dtype=bool), np.array(potential, dtype=float)
+    return update_spine_batch
+
+
+def synapse_fallback(update_synapse):
+    def update_synapse_batch(exciter, axon_active, strength, bias):
+        results = [update_synapse(*values, bias)
+                   for values in zip(exciter.tolist(), axon_active.tolist(), strength.tolist())]
+        strength, potential = zip(*results) if results else ((), ())
+        return np.array(strength, dtype=float), np.array(potential, dtype=float)
+    return update_synapse_batch
+
+
+def node_fallback(update_node):
+    def update_node_batch(cell_potential, cell_segments, dendrite_potential, dendrite_segments,
+                          spine_connected, synapse_potential, spine_segments):
+        return np.array([
+            update_node(
+                {index: Item(potential=value) for index, value in enumerate(cell_potential[cells[0]:cells[1]])},
+                [Item(potential=value) for value in dendrite_potential[dendrites[0]:dendrites[1]]],
+                [Item(connected=connected, synapse=Item(potential=potential)) for connected, potential in
+                 zip(spine_connected[spines[0]:spines[1]], synapse_potential[spines[0]:spines[1]])])
+            for cells, dendrites, spines in zip(segment_bounds(cell_segments), segment_bounds(dendrite_segments),
+                                                segment_bounds(spine_segments))
+        ], dtype=float)
+    return update_node_batch
+
+
+FALLBACKS = {
+    'update_cell': cell_fallback,
+    'update_dendrite': dendrite_fallback,
+    'update_spine': spine_fallback,
+    'update_synapse': synapse_fallback,
+    'update_node': node_fallback,
+}
+
+
+def random_arguments(name: str, size: int, rng: np.random.Generator) -> tuple:
+    """ random arguments, over the working ranges of the model, for the array version of an update function """
+    def potentials(count):
+        return rng.uniform(REST_POTENTIAL - 30, FIRING_POTENTIAL + 30, count)
+
+    if name == 'update_cell':
+        segments = Segments(rng.integers(0, 4, size))
+        return potentials(segments.offsets[-1]), segments, potentials(size), np.full(size, float(FIRING_POTENTIAL))
+    if name == 'update_dendrite':
+        segments = Segments(rng.integers(0, 6, size))
+        return potentials(segments.offsets[-1]), segments
+    if name == 'update_spine':
+        return rng.random(size) < 0.5, potentials(size), rng.uniform(MIN_LENGTH, MAX_LENGTH, size), \
+            rng.random(size) < 0.5, potentials(size)
+    if name == 'update_synapse':
+        return rng.random(size) < 0.5, rng.random(size) < 0.5, rng.uniform(MIN_STRENGTH, MAX_STRENGTH, size), \
+            float(REST_POTENTIAL + DV_INHIBIT)
+    if name == 'update_node':
+        cell_segments = Segments(rng.integers(0, 2, size))
+        dendrite_segments = Segments(rng.integers(0, 4, size))
+        spine_segments = Segments(rng.integers(0, 6, size))
+        spines = spine_segments.offsets[-1]
+        return potentials(cell_segments.offsets[-1]), cell_segments, \
+            potentials(dendrite_segments.offsets[-1]), dendrite_segments, \
+            rng.random(spines) < 0.5, potentials(spines), spine_segments
+    raise ValueError(f"No array version of {name}")
+
+
+def check(user_functions=UserFunctions, size: int = 1000, seed: int = 123456789) -> dict:
+    """
+    Compare the array version of each update function with its scalar version applied element by element.
+
+    :return: dictionary, by function name, of the number of elements on which they disagree,
+             or None for functions without an array version
+    """
+    rng = np.random.default_rng(seed)
+    batch = BatchFunctions(user_functions)
+    mismatches = {}
+    for name in NAMES:
+        if name in batch.wrapped:
+            mismatches[name] = None
+            continue
+        arguments = random_arguments(name, size, rng)
+        expected = FALLBACKS[name](getattr(user_functions, name))(*arguments)
+        actual = getattr(batch, name)(*arguments)
+        if not isinstance(expected, tuple):
+            expected, actual = (expected,), (actual,)
+        disagree = np.zeros(len(expected[0]), dtype=bool)
+        for want, got in zip(expected, actual):
+            disagree |= ~np.isclose(np.asarray(got, dtype=float), want, rtol=1e-9, atol=1e-9)
+        mismatches[name] = int(disagree.sum())
+    return mismatches
+
+
+if __name__ == "__main__":
+
+    for function, count in check().items():
+        if count is None:
+            print(f"{function + '_batch':24} not defined: {function} is applied element by element")
+        else:
+            print(f"{function + '_batch':24} {'agrees' if count == 0 else f'DISAGREES on {count}'} "
+                  f"with {function} on random inputs")
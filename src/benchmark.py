@@ -0,0 +1,525 @@
+"""
+    Program: ALBERT
+    Module: benchmark.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Timing benchmarks for the simulator, run on synthetic grid modules built from the cell_types in model_spec.py, eg:
+
+    python benchmark.py schedule --sizes 20 40 80 160
+    python benchmark.py activity --sizes 40 80 160
+    python benchmark.py fastforward --seconds 150
+    python benchmark.py parallel --sizes 80 --modules 4 --workers 4
+    python benchmark.py lazy --sizes 40 80 160
+    python benchmark.py construction --sizes 250 500 1000 --lazy
+    python benchmark.py nodes --sizes 100 250 500 --density 0.01
+    python benchmark.py checkpoint --sizes 80 160 320
+    python benchmark.py trace --sizes 40 80 160
+    python benchmark.py frames --sizes 20 40 80
+    python benchmark.py lines --hours 3
+    python benchmark.py render --seconds 60
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import time
+import tracemalloc
+
+import numpy as np
+
+from actor import Actor
+from brain import Brain
+from engine import Engine
+from constants import *
+from trainer import Trainer
+from checkpoint import snapshot, write, load
+from recorder import Recorder
+from delta import DeltaEncoder
+from transport import StatePublisher
+from subscription import Subscription
+from sweep import override
+from model_spec import cell_types, brain, plot_request, UPS, DPS, FIRING_POTENTIAL
+
+
+def grid_brain(rows: int, cols: int, modules: int = 1) -> dict:
+    """
+    A brain with rows x cols modules: a row of sensors along the base, pyramids on every other row and column
+    above them and a row of motors along the top.
+    """
+    return {
+        DESCRIPTION: f"Benchmark grid {rows}x{cols}",
+        MODULES: [{
+            DESCRIPTION: f"Benchmark grid {rows}x{cols}",
+            DIMENSIONS: (rows, cols),
+            CELLS: {
+                "sensor": {FILL: {STOP: (1, cols)}},
+                "pyramid": {TILE: {START: (2, 1), STOP: (rows - 2, cols - 1), STEP: (2, 2)}},
+                "motor": {FILL: {START: (rows - 1, 0)}},
+            },
+        }] * modules,
+    }
+
+
+def sparse_brain(rows: int, cols: int, density: float) -> dict:
+    """ A brain with a rows x cols module: sensors and motors as in grid_brain(), pyramids scattered at a density. """
+    return {
+        DESCRIPTION: f"Benchmark sparse {rows}x{cols}",
+        MODULES: [{
+            DESCRIPTION: f"Benchmark sparse {rows}x{cols}",
+            DIMENSIONS: (rows, cols),
+            CELLS: {
+                "sensor": {FILL: {STOP: (1, cols)}},
+                "pyramid": {RANDOM: {START: (2, 1), STOP: (rows - 1, cols - 1), DENSITY: density, SEED: 1}},
+                "motor": {FILL: {START: (rows - 1, 0)}},
+            },
+        }],
+    }
+
+
+def per_tick_ms(function, ticks: int) -> float:
+    t_start = time.perf_counter()
+    for _ in range(ticks):
+        function()
+    return (time.perf_counter() - t_start) / ticks * 1000
+
+
+def _stimulated_module(brain, size: int, index: int = 0):
+    """
+    Put a module of a size x size grid brain (see grid_brain()) on the array engine, with a third of its first row of
+    cells (the sensors) held active.
+
+    :return: the module
+    """
+    module = brain.modules[index]
+    module.array_engine = True
+    module.compile()
+    for cell in list(module.cells.values())[:size:3]:
+        cell.injected_potential = FIRING_POTENTIAL + 1
+    return module
+
+
+def breadth_first_walk(module):
+    """ the per-tick breadth-first walk that Module.on_tick() made before its schedule was precomputed """
+    cell_set = set([cell for cell in module.cells.values() if cell.cell_type == SENSOR])
+    cells_done = set([])
+    cell_next_set = set([])
+    while len(cell_set) > 0:
+        for cell in cell_set:
+            if cell not in cells_done:
+                cells_done.add(cell)
+            for child in cell.children:
+                cell_next_set.add(child)
+        cell_set = cell_next_set
+        cell_next_set = set([])
+
+
+def schedule(sizes: list, ticks: int):
+    """ scheduling overhead per tick: breadth-first walk vs precomputed schedule """
+    print(f"{'grid':>10} {'cells':>7} {'walk ms':>9} {'schedule ms':>12}")
+    for size in sizes:
+        module = Brain(None, grid_brain(size, size), cell_types).modules[0]
+
+        def iterate_schedule():
+            for _ in module.topology.schedule:
+                pass
+
+        walk_ms = per_tick_ms(lambda: breadth_first_walk(module), ticks)
+        print(f"{size:>4}x{size:<5} {len(module.cells):>7} {walk_ms:9.3f} {per_tick_ms(iterate_schedule, ticks):12.4f}")
+
+
+def activity(sizes: list, ticks: int):
+    """
+    Tick time of the array engine, updating every spine vs only the awake spines (event driven), with a third of the
+    sensors held active. Both modules settle for a few hundred ticks before they are timed.
+    """
+    print(f"{'grid':>10} {'spines':>8} {'awake':>7} {'all ms':>8} {'events ms':>10}")
+    for size in sizes:
+        times = []
+        for event_driven in (False, True):
+            module = _stimulated_module(Brain(None, grid_brain(size, size), cell_types), size)
+            module.event_driven = event_driven
+            for _ in range(500):
+                module.on_tick()
+            times.append(per_tick_ms(module.on_tick, ticks))
+        print(f"{size:>4}x{size:<5} {len(module.spines):>8} {len(module.engine.awake):>7} "
+              f"{times[0]:8.3f} {times[1]:10.3f}")
+
+
+def parallel(size: int, modules: int, workers: int, ticks: int):
+    """
+    Tick time of a brain of several size x size modules, stepped in turn and in worker processes,
+    and the largest difference between their states.
+    """
+    brains = []
+    for worker_count in (0, workers):
+        brain = Brain(None, grid_brain(size, size, modules), cell_types)
+        for index in range(modules):
+            _stimulated_module(brain, size, index)
+        brain.worker_count = worker_count
+        brain.on_tick()
+        brains.append(brain)
+    times = [per_tick_ms(brain.on_tick, ticks) for brain in brains]
+    difference = max(
+        float(np.abs(getattr(serial.engine, name) - getattr(worker.engine, name).astype(float)).max(initial=0.0))
+        for serial, worker in zip(brains[0].modules, brains[1].modules) for name in Engine.STATE)
+    brains[1].stop_workers()
+    print(f"{modules} modules of {size}x{size}: in turn {times[0]:.3f} ms/tick, "
+          f"{workers} workers {times[1]:.3f} ms/tick, largest difference in state {difference:.3g}")
+
+
+def lazy(sizes: list, ticks: int):
+    """
+    Construction time and memory of a module with every spine created at once vs created when its axon first becomes
+    active (LAZY_SPINES), and the spines created and tick time of the array engine after a third of the sensors have
+    been held active for a number of ticks.
+    """
+    print(f"{'grid':>10} {'lazy':>5} {'build s':>8} {'memory MB':>10} {'spines':>8} {'ms/tick':>8}")
+    for size in sizes:
+        for lazy_spines in (False, True):
+            override({'LAZY_SPINES': lazy_spines})
+            tracemalloc.start()
+            t_start = time.perf_counter()
+            brain = Brain(None, grid_brain(size, size), cell_types)
+            build_time = time.perf_counter() - t_start
+            memory = tracemalloc.get_traced_memory()[0] / 1e6
+            tracemalloc.stop()
+            module = _stimulated_module(brain, size)
+            tick_ms = per_tick_ms(module.on_tick, ticks)
+            print(f"{size:>4}x{size:<5} {str(lazy_spines):>5} {build_time:8.2f} {memory:10.1f} "
+                  f"{len(module.spines):>8} {tick_ms:8.3f}")
+    override({'LAZY_SPINES': False})
+
+
+def construction(sizes: list, lazy_spines: bool):
+    """
+    Construction time of a module from its cell types (see templates.py), with its spines created at once or
+    recorded as latent spines (LAZY_SPINES), and the time of its first compile.
+    """
+    override({'LAZY_SPINES': lazy_spines})
+    print(f"{'grid':>12} {'cells':>8} {'spines':>9} {'latent':>9} {'build s':>8} {'compile s':>10}")
+    for size in sizes:
+        spec = grid_brain(size, size)
+        t_start = time.perf_counter()
+        module = Brain(None, spec, cell_types).modules[0]
+        build_time = time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        module.compile()
+        compile_time = time.perf_counter() - t_start
+        latent = len(module.latent) if module.latent is not None else 0
+        print(f"{size:>5}x{size:<6} {len(module.cells):>8} {len(module.spines):>9} {latent:>9} "
+              f"{build_time:8.2f} {compile_time:10.2f}")
+        del module
+    override({'LAZY_SPINES': False})
+
+
+def nodes(sizes: list, density: float, ticks: int):
+    """
+    Construction memory of a sparse module (see sparse_brain()), whose nodes are created only where occupied,
+    and the time of a sweep of its node potentials by the Node objects and by the array engine.
+    """
+    print(f"{'grid':>12} {'area':>8} {'nodes':>7} {'memory MB':>10} {'objects ms':>11} {'engine ms':>10}")
+    for size in sizes:
+        spec = sparse_brain(size, size, density)
+        tracemalloc.start()
+        module = Brain(None, spec, cell_types).modules[0]
+        memory = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+        objects_ms = per_tick_ms(module.nodes_on_tick, ticks)
+        module.array_engine = True
+        module.compile()
+        engine_ms = per_tick_ms(module.nodes_on_tick, ticks)
+        print(f"{size:>5}x{size:<6} {size * size:>8} {len(module.nodes):>7} {memory:10.1f} "
+              f"{objects_ms:11.3f} {engine_ms:10.3f}")
+
+
+def checkpoint(sizes: list, ticks: int):
+    """
+    Time to copy the state of an actor whose module has run for a number of ticks on the array engine (the pause in
+    Actor.live()), to write it to a checkpoint in the background and to load it into a new actor, against the time
+    to build the actor and run those ticks again.
+    """
+    print(f"{'grid':>10} {'spines':>8} {'copy ms':>8} {'write ms':>9} {'file MB':>8} {'load s':>7} {'rerun s':>8}")
+    path = 'benchmark_checkpoint.npz'
+    for size in sizes:
+        spec = grid_brain(size, size)
+
+        def run() -> Actor:
+            actor = Actor(None, spec, cell_types, UPS, Trainer())
+            _stimulated_module(actor.brain, size)
+            return actor
+
+        t_start = time.perf_counter()
+        actor = run()
+        actor.advance(ticks)
+        rerun_time = time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        arrays = snapshot(actor)
+        copy_ms = (time.perf_counter() - t_start) * 1000
+        t_start = time.perf_counter()
+        write(path, arrays)
+        write_ms = (time.perf_counter() - t_start) * 1000
+        t_start = time.perf_counter()
+        load(run(), path)
+        load_time = time.perf_counter() - t_start
+        print(f"{size:>4}x{size:<5} {len(actor.brain.modules[0].spines):>8} {copy_ms:8.1f} {write_ms:9.1f} "
+              f"{os.path.getsize(path) / 1e6:8.1f} {load_time:7.2f} {rerun_time:8.2f}")
+    os.remove(path)
+
+
+def trace(sizes: list, ticks: int):
+    """
+    Brain time per tick on the array engine, against the time to record the potentials of ten cells, or the length
+    of every spine of the module, into a trace on each tick (see recorder.py).
+    """
+    print(f"{'grid':>10} {'spines':>8} {'brain ms':>9} {'10 cells ms':>12} {'all spines ms':>14}")
+    path = 'benchmark_trace.npy'
+    for size in sizes:
+        actor = Actor(None, grid_brain(size, size), cell_types, UPS, Trainer())
+        module = _stimulated_module(actor.brain, size)
+        brain_ms = per_tick_ms(actor.brain.on_tick, ticks)
+        times = []
+        for request in [{MODULE: module.key, ITEMS: CELLS, VARIABLE: POTENTIAL, ITEM_KEYS: list(module.cells)[:10]},
+                        {MODULE: module.key, ITEMS: SPINES, VARIABLE: LENGTH}]:
+            recorder = Recorder(actor.brain, [request], path, ticks)
+            tick = iter(range(ticks))
+            times.append(per_tick_ms(lambda: recorder.on_tick(next(tick)), ticks))
+            recorder.close()
+        print(f"{size:>4}x{size:<5} {len(module.spines):>8} {brain_ms:9.3f} {times[0]:12.4f} {times[1]:14.4f}")
+    os.remove(path)
+    os.remove(f'{path}.json')
+
+
+def frames(sizes: list, ticks: int):
+    """
+    Per frame for the monitor, every tenth tick, from a module on the array engine with a third of its sensors held
+    active: time to dump its state, and to pickle the dump and size, whole and as a delta from the previous frame
+    (see delta.py), against the time to publish the frame in shared memory (see transport.py), whole and for the
+    plots of plot_request in model_spec.py (see subscription.py).
+    """
+    print(f"{'grid':>10} {'dump ms':>8} {'whole ms':>9} {'whole kB':>9} {'delta ms':>9} {'delta kB':>9} "
+          f"{'shared ms':>10} {'watched ms':>11}")
+    for size in sizes:
+        actor = Actor(None, grid_brain(size, size), cell_types, UPS, Trainer())
+        _stimulated_module(actor.brain, size)
+        deltas = DeltaEncoder()
+        publisher = StatePublisher(actor.brain)
+        publisher.publish(0)
+        watched = StatePublisher(actor.brain)
+        watched.subscribe(Subscription(plot_request))
+        watched.publish(0)
+        times = np.zeros(5)
+        sizes_kb = np.zeros(2)
+        count = 0
+        for tick in range(ticks):
+            actor.brain.on_tick()
+            if tick % 10:
+                continue
+            t_start = time.perf_counter()
+            state = actor.brain.on_state_dump()
+            t_dump = time.perf_counter()
+            whole = pickle.dumps(state)
+            t_whole = time.perf_counter()
+            delta = pickle.dumps(deltas.encode(state))
+            t_delta = time.perf_counter()
+            publisher.publish(tick)
+            t_shared = time.perf_counter()
+            watched.publish(tick)
+            t_watched = time.perf_counter()
+            times += [t_dump - t_start, t_whole - t_dump, t_delta - t_whole, t_shared - t_delta, t_watched - t_shared]
+            sizes_kb += [len(whole) / 1000, len(delta) / 1000]
+            count += 1
+        publisher.close()
+        watched.close()
+        times *= 1000 / count
+        sizes_kb /= count
+        print(f"{size:>4}x{size:<5} {times[0]:8.1f} {times[1]:9.1f} {sizes_kb[0]:9.0f} {times[2]:9.1f} "
+              f"{sizes_kb[1]:9.0f} {times[3]:10.2f} {times[4]:11.2f}")
+
+
+def lines(hours: int):
+    """
+    Soak test of a lines subplot of three lines, fed DPS values a second for hours of monitor time: time per update
+    and memory held, every half hour, and the time to draw the subplot (off screen) at the start and the end.
+    """
+    import matplotlib
+    matplotlib.use('agg')
+    import matplotlib.pyplot as plt
+    from plotter import Plotter
+
+    def draw_ms() -> float:
+        t_start = time.perf_counter()
+        figure.canvas.draw()
+        return (time.perf_counter() - t_start) * 1000
+
+    figure, subplot = plt.subplots()
+    request = {Y_DATA: {'sy-01': 0.0, 'sy-05': 0.0, 'sy-17': 0.0}, X_RANGE: [-50, 0], Y_BASE: 0, VARIABLE: STRENGTH}
+    plot = Plotter.SubPlot.Lines(subplot, request)
+    first_draw_ms = draw_ms()
+    print(f"{'hours':>6} {'update ms':>10} {'memory kB':>10}")
+    tracemalloc.start()
+    frames_per_report = DPS * 1800
+    for report in range(2 * hours):
+        t_start = time.perf_counter()
+        for frame in range(report * frames_per_report, (report + 1) * frames_per_report):
+            for key in request[Y_DATA]:
+                request[Y_DATA][key] = np.sin(frame / 100)
+            plot.plot(request)
+        update_ms = (time.perf_counter() - t_start) / frames_per_report * 1000
+        print(f"{(report + 1) / 2:6.1f} {update_ms:10.4f} {tracemalloc.get_traced_memory()[0] / 1000:10.0f}")
+    tracemalloc.stop()
+    print(f"draw: {first_draw_ms:.1f} ms at the start, {draw_ms():.1f} ms after {hours} hours")
+    plt.close(figure)
+
+
+def render(seconds: int):
+    """
+    Refresh of the monitor's figure for plot_request in model_spec.py (off screen), fed a frame of the model's
+    state every 1/DPS seconds as it trains: time per refresh, drawing the whole figure as Plotter.draw() does against
+    blitting the subplots' changing artists as Plotter.refresh() does, and the drawing time per second of
+    monitor time, at DPS frames a second: a full draw every DPS frames against a blit every frame.
+    """
+    import warnings
+    import matplotlib
+    matplotlib.use('agg')
+    import matplotlib.pyplot as plt
+    from plotter import Plotter
+    from translator import DataTranslator
+
+    class OffScreenPlotter(Plotter):
+        def _set_plot_config(self):
+            matplotlib.style.use('fast')
+            plt.style.use('dark_background')
+
+    actor = training_actor(False)
+    subscription = Subscription(plot_request)
+    translator = None
+    plotters = {}
+    times = {True: [], False: []}
+    warnings.filterwarnings('ignore', message='.*non-interactive')
+    for frame in range(seconds * DPS):
+        actor.train(UPS // DPS)
+        state = actor.brain.on_state_dump(subscription)
+        state[TIME_ALIVE_CYCLES] = actor.time_alive
+        if translator is None:
+            translator = DataTranslator(plot_request, state)
+            for blit in times:
+                plotters[blit] = OffScreenPlotter(translator.figure_data, translator.plot_data)
+                plotters[blit].blit = blit
+            continue
+        translator.translate(state)
+        for blit, plotter in plotters.items():
+            t_start = time.perf_counter()
+            if blit:
+                plotter.plot(translator.plot_data)
+            else:
+                for request in translator.plot_data:
+                    plotter.subplots[request[SUBPLOT]].plot(request)
+                plotter.canvas.draw()
+            times[blit].append(time.perf_counter() - t_start)
+    for plotter in plotters.values():
+        plt.close(plotter.plot_object)
+    # leave out the first refreshes, which create the subplots and draw in full
+    draw_ms, blit_ms = [np.median(times[blit][2:]) * 1000 for blit in (False, True)]
+    print(f"{len(times[True])} frames: full draw {draw_ms:.1f} ms ({1000 / draw_ms:.0f} refreshes/s), "
+          f"blit {blit_ms:.1f} ms ({1000 / blit_ms:.0f} refreshes/s), {draw_ms / blit_ms:.1f}x")
+    print(f"per second of monitor time: full draw once {draw_ms:.1f} ms, blit {DPS} times {DPS * blit_ms:.1f} ms")
+
+
+def training_actor(fast_forward: bool) -> Actor:
+    """ an actor for the model and training data in model_spec.py, on the array engine """
+    actor = Actor(None, brain, cell_types, UPS, Trainer())
+    for module in actor.brain.modules:
+        module.array_engine = True
+        module.compile()
+    actor.fast_forward = fast_forward
+    return actor
+
+
+def fast_forward(seconds: int):
+    """
+    Train the model in model_spec.py tick by tick and with settled stretches fast-forwarded in closed form,
+    and compare their times and states, second by second.
+    """
+    stepped, forwarded = training_actor(False), training_actor(True)
+    stepped_ms = forwarded_ms = 0
+    differences = {}
+    mismatches = 0
+    for _ in range(seconds):
+        stepped_ms += per_tick_ms(lambda: stepped.train(UPS), 1)
+        forwarded_ms += per_tick_ms(lambda: forwarded.train(UPS), 1)
+        for stepped_module, forwarded_module in zip(stepped.brain.modules, forwarded.brain.modules):
+            for name in ['spine_length', 'spine_potential', 'synapse_strength', 'synapse_potential',
+                         'dendrite_potential', 'cell_potential']:
+                difference = np.abs(getattr(stepped_module.engine, name) - getattr(forwarded_module.engine, name))
+                differences[name] = max(differences.get(name, 0.0), float(difference.max(initial=0.0)))
+            for name in ['spine_connected', 'cell_active', 'axon_active']:
+                mismatches += int(np.sum(getattr(stepped_module.engine, name) !=
+                                         getattr(forwarded_module.engine, name)))
+    ticks = seconds * UPS
+    print(f"{seconds} s ({ticks} ticks): stepped {stepped_ms:.1f} ms, fast-forwarded {forwarded_ms:.1f} ms "
+          f"({forwarded.ticks_fast_forwarded} ticks in closed form, {stepped_ms / forwarded_ms:.1f}x)")
+    print(f"state mismatches (connected, active): {mismatches}")
+    for name, difference in differences.items():
+        print(f"largest difference in {name:20} {difference:.3g}")
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.ERROR)
+    parser = argparse.ArgumentParser(description='ALBERT benchmarks')
+    parser.add_argument('benchmark', choices=['schedule', 'activity', 'fastforward', 'parallel', 'lazy',
+                                                    'construction', 'nodes', 'checkpoint', 'trace',
+                                                    'frames', 'lines', 'render'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 40, 80, 160], help='module rows (= columns)')
+    parser.add_argument('--ticks', type=int, default=100)
+    parser.add_argument('--modules', type=int, default=4, help='modules in the brain (parallel)')
+    parser.add_argument('--workers', type=int, default=4, help='worker processes (parallel)')
+    parser.add_argument('--lazy', action='store_true', help='record spines as latent spines (construction)')
+    parser.add_argument('--density', type=float, default=0.01, help='density of pyramids (nodes)')
+    parser.add_argument('--seconds', type=int, default=150, help='seconds of training (fastforward, render)')
+    parser.add_argument('--hours', type=int, default=3, help='hours of monitor time (lines)')
+    args = parser.parse_args()
+    if args.benchmark == 'schedule':
+        schedule(args.sizes, args.ticks)
+    elif args.benchmark == 'activity':
+        activity(args.sizes, args.ticks)
+    elif args.benchmark == 'fastforward':
+        fast_forward(args.seconds)
+    elif args.benchmark == 'parallel':
+        for size in args.sizes:
+            parallel(size, args.modules, args.workers, args.ticks)
+    elif args.benchmark == 'lazy':
+        lazy(args.sizes, args.ticks)
+    elif args.benchmark == 'construction':
+        construction(args.sizes, args.lazy)
+    elif args.benchmark == 'nodes':
+        nodes(args.sizes, args.density, args.ticks)
+    elif args.benchmark == 'checkpoint':
+        checkpoint(args.sizes, args.ticks)
+    elif args.benchmark == 'trace':
+        trace(args.sizes, args.ticks)
+    elif args.benchmark == 'frames':
+        frames(args.sizes, args.ticks)
+    elif args.benchmark == 'lines':
+        lines(args.hours)
+    elif args.benchmark == 'render':
+        render(args.seconds)
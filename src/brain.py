@@ -25,7 +25,10 @@ import logging
 from abs_events import AbsUpdatable
 from module import Module
 from bridge import Bridge
+from workers import ModuleWorkers
+from registry import IdRegistry
 from constants import *
+from model_spec import WORKERS
 
 
 # noinspection PyBroadException
@@ -34,12 +37,16 @@ class Brain(AbsUpdatable):
     def __init__(self, actor, brain, cell_types):
         # the actor hosting this brain
         self.actor = actor
+        # ids of the brain's components (see registry.py)
+        self.ids = IdRegistry()
         # the brain has:
         self.description = brain[DESCRIPTION]
         self.module_specs = None
         self.modules = []
         self.bridge_specs = None
         self.bridges = []
+        self.worker_count = WORKERS  # > 1: step the modules in worker processes
+        self.workers = None
         # cell and module specifications
         self.cell_specs = cell_types
         if 'modules' in brain.keys():
@@ -68,14 +75,50 @@ class Brain(AbsUpdatable):
                          )
         logging.info(f'\nbridges: {len(self.bridges)}')
 
-    def on_state_dump(self):
+    def on_state_dump(self, subscription=None):
+        """ :param subscription: the parts of the state to dump (see subscription.py), None for all of it """
         return {
             DESCRIPTION: self.description,
-            MODULES: {list(module.on_state_dump().keys())[0]: list(module.on_state_dump().values())[0] for module in self.modules},
-            BRIDGES: {bridge.key: bridge.on_state_dump() for bridge in self.bridges},
+            MODULES: {key: state for module in self.modules
+                      for key, state in module.on_state_dump(subscription).items()},
+            BRIDGES: {bridge.key: bridge.on_state_dump() for bridge in self.bridges} if subscription is None else {},
         }
 
     def on_tick(self):
-        for module in self.modules:
-            module.on_tick()
-        # note: bridges are updated within the modules that they connect.
+        if self.worker_count > 1:
+            self.start_workers().on_tick()
+        else:
+            for module in self.modules:
+                module.on_tick()
+        # the bridges pass the activity at their sources on to the modules at their destinations, for the next tick
+        for bridge in self.bridges:
+            bridge.on_tick()
+
+    def start_workers(self) -> ModuleWorkers:
+        """ start the worker processes for the modules, once """
+        if self.workers is None:
+            self.workers = ModuleWorkers(self, self.worker_count)
+        return self.workers
+
+    def stop_workers(self):
+        if self.workers is not None:
+            self.workers.stop()
+            self.workers = None
+
+    def fast_forward(self, limit: int) -> int:
+        """
+        Advance up to limit ticks in closed form, as far as every module has settled (see Module.settled_ticks()).
+
+        :return: number of ticks advanced
+        """
+        if self.worker_count > 1:
+            workers = self.start_workers()
+            ticks = workers.settled_ticks(limit)
+            if ticks > 0:
+                workers.fast_forward(ticks)
+            return ticks
+        ticks = min([module.settled_ticks(limit) for module in self.modules], default=0)
+        if ticks > 0:
+            for module in self.modules:
+                module.fast_forward(ticks)
+        return ticks
@@ -21,31 +21,54 @@ __email__ = ""
 __status__ = "Production"
 
 from spine import Spine
-import itertools
 from abs_events import AbsUpdatable
 
 from constants import *
 
 
+class BridgeAxon:
+    """
+    BridgeAxon stands in for an axon at the source of a bridge, in the module at its destination, where it feeds the
+    bridge's spines. It holds the source axon's activity as it was at the end of the last tick (see Bridge.on_tick()),
+    so that the modules see each other's activity at the same point whether they are stepped in turn or in worker
+    processes (see workers.py).
+    """
+
+    def __init__(self, source, module):
+        self.source = source            # the axon at the source of the bridge
+        self.module = module            # the module at the destination
+        self.id = source.id
+        self.key = source.key
+        self.exciter = source.exciter
+        self.active = source.active
+        self.spines = []                # spines fed by this axon
+
+    def relay(self, active: bool):
+        """ take on the activity of the source axon, waking the spines resting on the previous one """
+        if active != self.active and self.module.event_driven:
+            for spine in self.spines:
+                spine.dendrite.awake.add(spine)
+        self.active = active
+
+
 class Bridge(AbsUpdatable):
     """
     Bridge creates a bridge from the specifications in models.py. It acts like a 'long-range' synapse.
-    A bridge creates spines on all dendrites in the destination node that connect to all axons in the source node.
+    A bridge creates spines on all dendrites in the destination node that connect to all axons in the source node,
+    through a BridgeAxon for each: the spines see the activity of the source axons one tick late.
     """
 
-    bridge_count = 0
-    _bridge_counter = itertools.count(1)
-
     def __init__(self, brain, bridge_spec):
-        # keep count of created objects
-        Bridge.bridge_count = next(self._bridge_counter)
         # reference to host brain
         self.brain = brain
+        # id, unique among the bridges of the brain
+        self.id = brain.ids.next(BRIDGE)
         # a bridge contains:
         self.axon = None
         self.dendrite = None
+        self.bridge_axons = []  # the axons of the source node, as seen at the destination
         # a bridge has:
-        self.key = Bridge.bridge_count
+        self.key = self.id
         self.from_module_id = bridge_spec["from"][0]
         self.from_location = bridge_spec["from"][1]
         self.to_module_id = bridge_spec["to"][0]
@@ -78,8 +101,11 @@ class Bridge(AbsUpdatable):
             }
 
     def on_tick(self):
-        # receiving dendrites trigger updates to spine / synapse for the bridge
-        pass
+        """ at the end of a tick of every module: pass the activity of the source axons on, for the next tick """
+        for axon in self.bridge_axons:
+            axon.relay(axon.source.active)
+        # the bridge is active while any axon at its source is active
+        self.active = any(axon.active for axon in self.bridge_axons)
 
     def _connect(self):
         """ create spines to connect each end of the bridge to co-located cells """
@@ -89,9 +115,13 @@ class Bridge(AbsUpdatable):
         # get from and to nodes from relevant modules
         from_node = from_module.nodes[self.from_location]
         to_node = to_module.nodes[self.to_location]
+        self.bridge_axons = [BridgeAxon(axon, to_module) for axon in from_node.axons]
         # connect each axon in source node to each dendrite in destination node
         for dendrite in to_node.dendrites:
-            for axon in from_node.axons:
-                spine = Spine(to_module.key, to_node.location, axon, dendrite)
+            for axon in self.bridge_axons:
+                spine = Spine(to_module, to_node.location, dendrite, axon)
                 dendrite.spines.append(spine)
-        # ToDo: test and debug bridge update process
+                dendrite.awake.add(spine)
+                axon.spines.append(spine)
+                to_node.spines.append(spine)
+        to_module.connectivity_changed()
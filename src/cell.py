@@ -20,12 +20,12 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
+from functools import cached_property
 from abs_events import AbsUpdatable
 from model_spec import UserFunctions, REST_POTENTIAL
 from axon import Axon
 from dendrite import Dendrite
 from constants import *
-import itertools
 
 
 class Cell(AbsUpdatable):
@@ -39,12 +39,13 @@ class Cell(AbsUpdatable):
     A module can span two or three dimensions and can be connected to other modules by Bridges.
     """
 
-    cell_count = 0
-    _cell_counter = itertools.count(1)
-
-    def __init__(self, module, location, spec):
-        # keep count of created objects
-        Cell.cell_count = next(Cell._cell_counter)
+    def __init__(self, module, location, spec, axon_locations: list = None, dendrite_locations: list = None):
+        """
+        :param axon_locations, dendrite_locations: absolute locations crossed by each axon and dendrite,
+                                                   if already calculated (see templates.py)
+        """
+        # id, unique among the cells of the brain
+        self.id = module.brain.ids.next(CELL)
         #
         self.module = module
         self.location = location
@@ -53,20 +54,26 @@ class Cell(AbsUpdatable):
         self.active = False
         self.injected_potential = REST_POTENTIAL
         self.potential = REST_POTENTIAL
-        self.axons = self._make_axons(spec)
-        self.dendrites = self._make_dendrites(spec)
+        self.axons = self._make_axons(spec, axon_locations)
+        self.dendrites = self._make_dendrites(spec, dendrite_locations)
         self.cell_type = self._get_cell_type()
-        self.key = f'{self.cell_type[:2]}-{Cell.cell_count:02d}'
 
-    def _make_dendrites(self, spec):
+    @cached_property
+    def key(self) -> str:
+        return f'{self.cell_type[:2]}-{self.id:02d}'
+
+    def _make_dendrites(self, spec, locations=None):
         if DENDRITES in spec.keys():
-            return [Dendrite(self, dendrite_spec) for dendrite_spec in spec[DENDRITES].values()]
+            locations = locations or [None] * len(spec[DENDRITES])
+            return [Dendrite(self, dendrite_spec, locs)
+                    for dendrite_spec, locs in zip(spec[DENDRITES].values(), locations)]
         else:
             return []
 
-    def _make_axons(self, spec):
+    def _make_axons(self, spec, locations=None):
         if AXONS in spec.keys():
-            return [Axon(self, axon_spec) for axon_spec in spec[AXONS].values()]
+            locations = locations or [None] * len(spec[AXONS])
+            return [Axon(self, axon_spec, locs) for axon_spec, locs in zip(spec[AXONS].values(), locations)]
         else:
             return []
 
@@ -0,0 +1,244 @@
+"""
+    Program: ALBERT
+    Module: checkpoint.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Checkpoints of an actor: the state of every component of its brain, the module biases and node potentials,
+the latent spines, the trainer's position in the training data and the actor's time alive, as flat arrays in an
+uncompressed .npz file, eg:
+
+    save(actor, 'checkpoint.npz')
+    ...
+    actor = Actor(None, brain, cell_types, UPS, Trainer())
+    load(actor, 'checkpoint.npz')
+
+The structure of the brain is not saved: a checkpoint is loaded into an actor built from the same model_spec.py,
+before its first tick, and the components are matched by id. Component state is saved in the order of each
+module's topology (see topology.py), straight from the engine's arrays when the module has one.
+"""
+
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from constants import *
+
+VERSION = 1
+
+# component state: engine array (see Engine.STATE) -> components and their attribute
+STATE = {
+    'cell_injected_potential': (CELLS, 'injected_potential'),
+    'cell_potential': (CELLS, 'potential'),
+    'cell_active': (CELLS, 'active'),
+    'dendrite_potential': (DENDRITES, 'potential'),
+    'axon_active': (AXONS, 'active'),
+    'spine_length': (SPINES, 'length'),
+    'spine_connected': (SPINES, 'connected'),
+    'spine_potential': (SPINES, 'potential'),
+    'synapse_strength': (SYNAPSES, 'strength'),
+    'synapse_potential': (SYNAPSES, 'potential'),
+}
+LATENT = ('location', 'dendrite', 'axon', 'spine_id', 'synapse_id')
+
+
+def module_components(module) -> dict:
+    """ the components of a module in the order of its topology, by kind """
+    topology = module.topology
+    return {
+        CELLS: topology.cells,
+        DENDRITES: topology.dendrites,
+        AXONS: topology.axons,
+        SPINES: topology.spines,
+        SYNAPSES: [spine.synapse for spine in topology.spines],
+    }
+
+
+def _trainer_state(trainer) -> str:
+    return json.dumps({
+        'cycle': trainer.cycle,
+        'data_row': trainer.data_row,
+        'presented_row': trainer.presented_row,
+        'random': trainer.random.getstate(),
+    })
+
+
+def _set_trainer_state(trainer, text: str):
+    state = json.loads(text)
+    trainer.cycle = state['cycle']
+    trainer.data_row = state['data_row']
+    trainer.presented_row = state['presented_row']
+    version, internal, gauss = state['random']
+    trainer.random.setstate((version, tuple(internal), gauss))
+
+
+def snapshot(actor) -> dict:
+    """
+    Copy the state of an actor into arrays, between ticks.
+
+    :return: arrays by name, as saved by write()
+    """
+    arrays = {
+        'version': np.array(VERSION),
+        'time_alive': np.array(actor.time_alive),
+        'ticks_fast_forwarded': np.array(actor.ticks_fast_forwarded),
+    }
+    if actor.trainer is not None:
+        arrays['trainer'] = np.array(_trainer_state(actor.trainer))
+    brain = actor.brain
+    for module in brain.modules:
+        if module.topology is None:
+            module.compile()
+        prefix = f'{module.key}/'
+        engine = module.engine
+        components = module_components(module) if engine is None else None
+        for kind, ids in module.topology.ids.items():
+            arrays[prefix + kind] = ids
+        for name, (kind, attribute) in STATE.items():
+            if engine is not None:
+                arrays[prefix + name] = getattr(engine, name).copy()
+            else:
+                arrays[prefix + name] = np.array([getattr(component, attribute) for component in components[kind]])
+        replicas = engine is not None and engine.replicas is not None
+        arrays[prefix + NODE_POTENTIAL] = engine.node_potential.copy() if replicas else module.node_potential.copy()
+        arrays[prefix + BIAS] = engine.bias.copy() if replicas else np.array([module.bias])
+        arrays[prefix + 'tick_bias'] = np.array(module.tick_bias)
+        if module.latent is not None:
+            records, materialised = module.latent.records()
+            for name in LATENT:
+                arrays[prefix + 'latent_' + name] = records[name]
+            arrays[prefix + 'latent_materialised'] = materialised
+            arrays[prefix + 'latent_ticks'] = np.array(module.latent.ticks)
+    return arrays
+
+
+def write(path: str, arrays: dict):
+    """ write a snapshot to a file, replacing any previous checkpoint only once it is complete """
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(partial, path)
+
+
+def save(actor, path: str):
+    """ checkpoint an actor, between ticks """
+    write(path, snapshot(actor))
+
+
+def _alignment(saved: np.ndarray, current: np.ndarray, what: str) -> np.ndarray:
+    """ :return: index into the saved components of each current component (matched by id) """
+    if np.array_equal(saved, current):
+        return np.arange(len(current))
+    if len(saved) != len(current):
+        raise ValueError(f"checkpoint does not match the brain: {what} differ")
+    order = np.argsort(saved, kind='stable')
+    index = order[np.searchsorted(saved, current, sorter=order).clip(max=len(saved) - 1)]
+    if not np.array_equal(saved[index], current):
+        raise ValueError(f"checkpoint does not match the brain: {what} differ")
+    return index
+
+
+def load(actor, path: str):
+    """
+    Restore the state of an actor from a checkpoint, written for an actor built from the same model specification.
+    Call before the actor's first tick (in particular before any worker processes start).
+
+    :raises ValueError: if the checkpoint does not match the brain
+    """
+    with np.load(path) as data:
+        arrays = {name: data[name] for name in data.files}
+    if int(arrays['version']) != VERSION:
+        raise ValueError(f"checkpoint version {int(arrays['version'])} is not {VERSION}")
+    actor.time_alive = int(arrays['time_alive'])
+    actor.ticks_fast_forwarded = int(arrays['ticks_fast_forwarded'])
+    if actor.trainer is not None and 'trainer' in arrays:
+        _set_trainer_state(actor.trainer, str(arrays['trainer']))
+    brain = actor.brain
+    for module in brain.modules:
+        prefix = f'{module.key}/'
+        if prefix + CELLS not in arrays:
+            raise ValueError(f"checkpoint does not match the brain: no module {module.key}")
+        if module.latent is not None and prefix + 'latent_spine_id' in arrays:
+            module.latent.restore({name: arrays[prefix + 'latent_' + name] for name in LATENT},
+                                  arrays[prefix + 'latent_materialised'], int(arrays[prefix + 'latent_ticks']))
+        if module.topology is None:
+            module.compile()
+        engine = module.engine
+        components = module_components(module) if engine is None else None
+        index = {kind: _alignment(arrays[prefix + kind], ids, f'{module.key} {kind}')
+                 for kind, ids in module.topology.ids.items()}
+        index[SYNAPSES] = index[SPINES]
+        for name, (kind, attribute) in STATE.items():
+            values = arrays[prefix + name][..., index[kind]]
+            if engine is not None:
+                getattr(engine, name)[...] = values
+            else:
+                for component, value in zip(components[kind], values.tolist()):
+                    setattr(component, attribute, value)
+        if engine is not None and engine.replicas is not None:
+            engine.node_potential[...] = arrays[prefix + NODE_POTENTIAL]
+            engine.bias[...] = arrays[prefix + BIAS]
+            engine.show(engine.replica.row)
+        else:
+            module.node_potential[...] = arrays[prefix + NODE_POTENTIAL]
+            module.bias = arrays[prefix + BIAS][0].item()
+        module.tick_bias = arrays[prefix + 'tick_bias'].item()
+        module.wake()
+    # between ticks, the bridge axons hold the activity of their source axons
+    for bridge in brain.bridges:
+        bridge.on_tick()
+    logging.info(f"resumed from {path} at {actor.time_alive} ticks")
+
+
+class Checkpointer:
+    """
+    Checkpointer checkpoints an actor periodically, eg from Actor.live(): at the end of every so many seconds of
+    model time the state is copied (see snapshot()), which is quicker than a state dump, and a background thread
+    writes it to the file while the actor carries on. A checkpoint falling due while the previous one is still
+    being written is skipped.
+    """
+
+    def __init__(self, actor, path: str, seconds: int):
+        self.actor = actor
+        self.path = path
+        self.ticks = seconds * actor.updates_per_second   # ticks between checkpoints
+        self.thread = None
+        self.skipped = 0
+
+    def on_second(self) -> bool:
+        """ :return: True if a checkpoint was started """
+        if self.actor.time_alive % self.ticks:
+            return False
+        if self.thread is not None and self.thread.is_alive():
+            self.skipped += 1
+            logging.warning(f"Warning: checkpoint skipped, {self.path} is still being written")
+            return False
+        arrays = snapshot(self.actor)
+        self.thread = threading.Thread(target=write, args=(self.path, arrays), daemon=True)
+        self.thread.start()
+        return True
+
+    def wait(self):
+        """ wait for the checkpoint being written, if any """
+        if self.thread is not None:
+            self.thread.join()
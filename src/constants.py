@@ -25,9 +25,13 @@ __status__ = "Production"
 GTK = 'gtk'
 MATPLOT = 'matplot'
 TIME_ALIVE_CYCLES = 'time_alive'
+STATE = 'state'
+TIMING = 'timing'
 
 DIE = 'die'
 PAUSE = 'pause'
+SEGMENT = 'segment'
+FIELDS = 'fields'
 
 HEATMAP = 'heatmap'
 CELL_MAP = 'cell-map'
@@ -56,6 +60,7 @@ V_MIN = 'v-min'
 V_MAX = 'v-max'
 
 KEY = 'key'
+CELL = 'cell'
 CELLS = 'cells'
 CHILDREN = 'children'
 SOMA = 'soma'
@@ -77,13 +82,24 @@ SPINES = 'spines'
 MODULE = 'module'
 MODULES = 'modules'
 DIMENSIONS = 'dimensions'
+NODE = 'node'
 NODES = 'nodes'
+NODE_POTENTIAL = 'node_potential'
 BRIDGE = 'bridge'
 BRIDGES = 'bridges'
 FROM_LOCATION = 'from_location'
 TO_LOCATION = 'to_location'
 FROM_MODULE_ID = 'from_module_id'
 TO_MODULE_ID = 'to_module_id'
+FILL = 'fill'
+TILE = 'tile'
+RANDOM = 'random'
+START = 'start'
+STOP = 'stop'
+STEP = 'step'
+PATTERN = 'pattern'
+DENSITY = 'density'
+SEED = 'seed'
 
 LENGTH = 'length'
 SPINE_LENGTH = 'length'
@@ -0,0 +1,123 @@
+"""
+    Program: ALBERT
+    Module: delta.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Delta encoding of the state dumps that the Actor sends to the Monitor (see Brain.on_state_dump()). The first dump
+is sent whole, as a handshake carrying the static parts of the state (keys, locations, children, descriptions);
+every later one is sent as its difference from the dump before, so a frame carries only the fields that have
+changed, and the Monitor applies it to its copy of the state.
+
+The delta of a dictionary holds the keys whose values have changed: a dictionary that was a dictionary before
+as the delta of the two, any other value whole, and a removed key as REMOVED.
+"""
+
+import numpy as np
+
+
+class _Removed:
+    """ the value of a key removed from a dictionary """
+
+    def __reduce__(self):
+        # unpickles as the same object, so that it can be recognised by identity
+        return 'REMOVED'
+
+    def __repr__(self):
+        return 'REMOVED'
+
+
+REMOVED = _Removed()
+
+
+def diff(previous: dict, current: dict) -> dict:
+    """ :return: the delta that turns previous into current """
+    delta = {}
+    common = 0
+    for key, value in current.items():
+        if key not in previous:
+            delta[key] = value
+            continue
+        common += 1
+        old = previous[key]
+        if old is value:
+            continue
+        if type(old) is not type(value):
+            delta[key] = value
+        elif isinstance(value, dict):
+            try:
+                # compared in C first: most of the dictionaries (components) are unchanged
+                if old == value:
+                    continue
+            except ValueError:
+                # holds arrays
+                pass
+            changes = diff(old, value)
+            if changes:
+                delta[key] = changes
+        elif isinstance(value, np.ndarray):
+            if old.shape != value.shape or old.dtype != value.dtype or not np.array_equal(old, value):
+                delta[key] = value
+        elif old != value:
+            delta[key] = value
+    if common < len(previous):
+        for key in previous:
+            if key not in current:
+                delta[key] = REMOVED
+    return delta
+
+
+def patch(state: dict, delta: dict):
+    """ apply a delta (see diff()) to a state, in place """
+    for key, value in delta.items():
+        if value is REMOVED:
+            del state[key]
+        elif isinstance(value, dict) and isinstance(state.get(key), dict):
+            patch(state[key], value)
+        else:
+            state[key] = value
+
+
+class DeltaEncoder:
+    """ DeltaEncoder turns a sequence of state dumps into the frames sent to the Monitor (see Actor) """
+
+    def __init__(self):
+        self.previous = None
+
+    def encode(self, state: dict) -> dict:
+        """ :return: the state, the first time, and its delta from the state before after that """
+        frame = state if self.previous is None else diff(self.previous, state)
+        self.previous = state
+        return frame
+
+
+class DeltaDecoder:
+    """ DeltaDecoder rebuilds the state dumps from the frames received by the Monitor """
+
+    def __init__(self):
+        self.state = None
+
+    def decode(self, frame: dict) -> dict:
+        """ :return: the state, updated in place by each frame after the first """
+        if self.state is None:
+            self.state = frame
+        else:
+            patch(self.state, frame)
+        return self.state
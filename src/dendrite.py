@@ -20,8 +20,8 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
+from functools import cached_property
 from operator import add
-import itertools
 
 from abs_events import AbsUpdatable
 from model_spec import UserFunctions, REST_POTENTIAL, FIRING_POTENTIAL
@@ -31,20 +31,25 @@ from constants import *
 class Dendrite(AbsUpdatable):
     """ Dendrite class creates dendrites from the specifications in models.py. """
 
-    dendrite_count = 0
-    _dendrite_counter = itertools.count(1)
-
-    def __init__(self, parent, dendrite_spec):
-        # keep count of created objects
-        Dendrite.dendrite_count = next(Dendrite._dendrite_counter)
+    def __init__(self, parent, dendrite_spec, locations: list = None):
+        """
+        :param locations: absolute locations of the nodes that the dendrite crosses, if already calculated
+                          (see templates.py)
+        """
+        # id, unique among the dendrites of the brain
+        self.id = parent.module.brain.ids.next(DENDRITE)
         #
-        self.key = f'de-{Dendrite.dendrite_count:02d}'
         self.parent = parent
         self.spines = []        # spines (initially zero length and unconnected) at all nodal axon-dendrite junctions
-        self.locations = [parent.location] + \
-                         [tuple(map(add, loc, parent.location)) for loc in dendrite_spec['relative_locs']]
+        self.awake = set()      # spines not yet at rest (event driven mode)
+        self.locations = locations if locations is not None else \
+            [parent.location] + [tuple(map(add, loc, parent.location)) for loc in dendrite_spec['relative_locs']]
         self.potential = REST_POTENTIAL
 
+    @cached_property
+    def key(self) -> str:
+        return f'de-{self.id:02d}'
+
     def on_state_dump(self):
         return {
             KEY: self.key,
@@ -57,6 +62,25 @@ class Dendrite(AbsUpdatable):
         }
 
     def on_tick(self):
+        if self.parent.module.event_driven:
+            self.on_tick_awake()
+            return
         for spine in self.spines:
             spine.on_tick()
         self.potential = UserFunctions.update_dendrite(self.spines)
+
+    def on_tick_awake(self):
+        """
+        Event driven update: only the awake spines are updated. A spine that its update leaves unchanged is at rest,
+        and sleeps until its axon changes state (see Axon.on_tick()).
+        """
+        if not self.awake:
+            return
+        changed = False
+        for spine in list(self.awake):
+            if spine.on_tick_settled():
+                self.awake.discard(spine)
+            else:
+                changed = True
+        if changed:
+            self.potential = UserFunctions.update_dendrite(self.spines)
@@ -0,0 +1,453 @@
+"""
+    Program: ALBERT
+    Module: engine.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import numpy as np
+
+from axon import Axon
+from cell import Cell
+from dendrite import Dendrite
+from spine import Spine
+from synapse import Synapse
+from topology import Segments, group, expand
+from batch_functions import BatchFunctions
+
+
+class ArrayAttribute:
+    """
+    Data descriptor that reads and writes a component's state in an engine array:
+    getattr(component.engine, array)[component.index]
+    """
+
+    def __init__(self, array: str, cast: callable = float):
+        self.array = array
+        self.cast = cast
+
+    def __get__(self, component, owner=None):
+        if component is None:
+            return self
+        return self.cast(getattr(component.engine, self.array)[component.index])
+
+    def __set__(self, component, value):
+        getattr(component.engine, self.array)[component.index] = value
+
+
+# Views are the component classes with their state redirected to an engine. Components are re-classed as views
+# when an engine binds them, so the plain object model pays nothing for the indirection.
+
+class CellView(Cell):
+    injected_potential = ArrayAttribute('cell_injected_potential')
+    potential = ArrayAttribute('cell_potential')
+    active = ArrayAttribute('cell_active', bool)
+
+
+class DendriteView(Dendrite):
+    potential = ArrayAttribute('dendrite_potential')
+
+
+class AxonView(Axon):
+    active = ArrayAttribute('axon_active', bool)
+
+
+class SpineView(Spine):
+    length = ArrayAttribute('spine_length')
+    connected = ArrayAttribute('spine_connected', bool)
+    potential = ArrayAttribute('spine_potential')
+
+
+class SynapseView(Synapse):
+    strength = ArrayAttribute('synapse_strength')
+    potential = ArrayAttribute('synapse_potential')
+
+
+def bind(component, view: type, engine, index: int):
+    """ re-class component as a view onto row index of the engine's arrays """
+    for name, attribute in vars(view).items():
+        if isinstance(attribute, ArrayAttribute):
+            component.__dict__.pop(name, None)
+    component.__class__ = view
+    component.engine = engine
+    component.index = index
+
+
+class Replica:
+    """
+    Replica stands in for an engine with replicas (see Engine) as the target of the component views: it holds the
+    row of each state array belonging to the replica shown, so the objects of the module read and write that copy
+    of the state. The module's bias and grid of node potentials are those of the replica shown.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.row = None
+
+    def show(self, row: int):
+        engine = self.engine
+        self.row = row
+        for name in engine.STATE:
+            setattr(self, name, getattr(engine, name)[row])
+        engine.module.node_potential = engine.node_potential[row].reshape(engine.module.node_potential.shape)
+        engine.module.bias = float(engine.bias[row, 0])
+
+
+class Engine:
+    """
+    Engine keeps the state of a module's components in contiguous numpy arrays (structure-of-arrays), indexed as in
+    the module's Topology, and advances each layer of the module's schedule in one vectorized step:
+    spines and synapses -> dendrites -> cells -> axons. Node potentials are then a scatter-max of the component
+    potentials into the module's node_potential grid.
+
+    The update rules are the array versions of the user's functions (see batch_functions.py). Dendrite and cell
+    potentials are segmented reductions over the CSR index arrays of the topology, and axon activity reaches the
+    spines with a single gather, from axon_inputs: the activity of the module's axons (axon_active, a view of its
+    first part) followed by that of its bridge axons (see Topology and Bridge), taken at the start of each tick.
+
+    In event driven mode (module.event_driven) only the awake spines are updated: a spine that its update leaves
+    unchanged is at rest, and sleeps until its axon changes state. Dendrites are then recomputed only where a spine
+    changed, and nodes only where one of their components changed, so the cost of a tick follows the activity of
+    the module rather than its number of spines.
+
+    Once bound, Cell, Dendrite, Axon, Spine and Synapse objects are thin views onto the arrays, so on_state_dump()
+    and the plotter see the same values as before.
+
+    With replicas, the engine holds that many independent copies of the state, one per row of each state array, over
+    the one topology, and advances them all in the same vectorized steps, each with its own bias. The objects are
+    then views onto the replica last shown (see show()). Event driven mode does not apply to replicas.
+    """
+
+    # arrays holding the state of the components, as opposed to their fixed properties
+    STATE = ('cell_injected_potential', 'cell_potential', 'cell_active', 'dendrite_potential', 'axon_active',
+             'spine_length', 'spine_connected', 'spine_potential', 'synapse_strength', 'synapse_potential')
+
+    def __init__(self, module, replicas: int = None):
+        """
+        :param replicas: number of independent copies of the state (see ensemble.py), each a row of the state
+                         arrays; None: a single copy, held in 1D arrays
+        """
+        self.module = module
+        self.topology = topology = module.topology
+        self.functions = BatchFunctions()
+        self.replicas = replicas
+
+        def state(values, dtype):
+            array = np.array(values, dtype=dtype)
+            return array if replicas is None else np.tile(array, (replicas, 1))
+
+        # static properties
+        self.cell_firing_threshold = np.array([cell.firing_threshold for cell in topology.cells], dtype=float)
+        self.spine_exciter = np.array([spine.axon.exciter for spine in topology.spines], dtype=bool)
+        # state, copied from the objects before they are bound
+        self.cell_injected_potential = state([cell.injected_potential for cell in topology.cells], float)
+        self.cell_potential = state([cell.potential for cell in topology.cells], float)
+        self.cell_active = state([cell.active for cell in topology.cells], bool)
+        self.dendrite_potential = state([dendrite.potential for dendrite in topology.dendrites], float)
+        self.axon_inputs = state([axon.active for axon in topology.axons + topology.bridge_axons], bool)
+        self.axon_active = self.axon_inputs[..., :len(topology.axons)]
+        self.spine_length = state([spine.length for spine in topology.spines], float)
+        self.spine_connected = state([spine.connected for spine in topology.spines], bool)
+        self.spine_potential = state([spine.potential for spine in topology.spines], float)
+        self.synapse_strength = state([spine.synapse.strength for spine in topology.spines], float)
+        self.synapse_potential = state([spine.synapse.potential for spine in topology.spines], float)
+        # bias of each replica (the module's bias is used for a single copy)
+        self.bias = None if replicas is None else np.full((replicas, 1), float(module.bias))
+        # each layer of the schedule owns a contiguous range of every array
+        self.layers = [
+            (cells, dendrites, spines, axons,
+             Segments(np.diff(topology.dendrite_spine_offsets[dendrites.start:dendrites.stop + 1])),
+             Segments(np.diff(topology.cell_dendrite_offsets[cells.start:cells.stop + 1])))
+            for cells, dendrites, spines, axons in topology.layer_ranges()
+        ]
+        # cells, dendrites (once per location crossed) and spines grouped by node, for the node potentials
+        self.node_potential = module.node_potential.reshape(-1) if replicas is None else \
+            state(module.node_potential.reshape(-1), float)
+        self.node_grid = topology.node_grid
+        self.node_cells, self.node_cell_segments = group(topology.cell_node, topology.node_count)
+        order, self.node_dendrite_segments = group(topology.dendrite_location_node, topology.node_count)
+        self.node_dendrites = topology.dendrite_location_dendrite[order]
+        self.node_spines, self.node_spine_segments = group(topology.spine_node, topology.node_count)
+        # the scheduled (updated) cells, dendrites, spines and axons: the first of each
+        scheduled_cells = topology.layer_offsets[-1]
+        scheduled_dendrites = topology.cell_dendrite_offsets[scheduled_cells]
+        self.scheduled = (slice(0, scheduled_cells), slice(0, scheduled_dendrites),
+                          slice(0, topology.dendrite_spine_offsets[scheduled_dendrites]),
+                          slice(0, topology.cell_axon_offsets[scheduled_cells]))
+        self.scheduled_segments = (Segments(np.diff(topology.dendrite_spine_offsets[:scheduled_dendrites + 1])),
+                                   Segments(np.diff(topology.cell_dendrite_offsets[:scheduled_cells + 1])))
+        # event driven mode: sorted indices of the spines to update on this tick (all, to begin with),
+        # and nodes to update (None: all)
+        self.events = False
+        self.awake = np.arange(len(topology.spines), dtype=np.intp)
+        self.dirty_nodes = None
+        # sorted indices of the axons that became active on the last tick (in any replica), eg for LatentSpines
+        self.activated = np.zeros(0, dtype=np.intp)
+        # make the objects views onto the arrays (of one replica, see Replica)
+        self.replica = None if replicas is None else Replica(self)
+        target = self if replicas is None else self.replica
+        for index, cell in enumerate(topology.cells):
+            bind(cell, CellView, target, index)
+        for index, dendrite in enumerate(topology.dendrites):
+            bind(dendrite, DendriteView, target, index)
+        for index, axon in enumerate(topology.axons):
+            bind(axon, AxonView, target, index)
+        for index, spine in enumerate(topology.spines):
+            bind(spine, SpineView, target, index)
+            bind(spine.synapse, SynapseView, target, index)
+        if replicas is not None:
+            self.replica.show(0)
+
+    def show(self, replica: int):
+        """ point the module's objects, and its grid of node potentials, at the state of one replica """
+        self.replica.show(replica)
+
+    def share(self, allocate: callable):
+        """
+        Move the state arrays, and the module's grid of node potentials, into new memory, eg shared memory.
+
+        :param allocate: function returning a copy of a numpy array in the new memory
+        """
+        for name in self.STATE:
+            if name != 'axon_active':
+                setattr(self, name, allocate(getattr(self, name)))
+        self.axon_inputs = allocate(self.axon_inputs)
+        self.axon_active = self.axon_inputs[..., :len(self.topology.axons)]
+        self.module.node_potential = allocate(self.module.node_potential)
+        self.node_potential = self.module.node_potential.reshape(-1)
+
+    def wake(self):
+        """ wake every spine and mark every node for update """
+        self.awake = np.arange(len(self.topology.spines), dtype=np.intp)
+        self.dirty_nodes = None
+
+    def read_bridges(self):
+        """ take the activity of the bridge axons, as passed on at the end of the last tick (see Bridge.on_tick()) """
+        topology = self.topology
+        if not topology.bridge_axons:
+            return
+        first = len(topology.axons)
+        active = np.array([axon.active for axon in topology.bridge_axons], dtype=bool)
+        if self.events:
+            # wake the spines of the bridge axons that have changed
+            changed = first + np.flatnonzero(active != self.axon_inputs[first:])
+            if len(changed):
+                positions, _ = expand(topology.axon_spine_offsets, changed)
+                self.awake = np.union1d(self.awake, topology.axon_spines[positions])
+        self.axon_inputs[..., first:] = active
+
+    def on_tick(self):
+        """
+        Advance the scheduled cells of the module by one tick, a layer at a time, as Cell.on_tick() does for each.
+        """
+        if self.module.event_driven and self.replicas is None:
+            if not self.events:
+                self.events = True
+                self.wake()
+            self.read_bridges()
+            self.on_tick_events()
+            return
+        self.events = False
+        self.read_bridges()
+        functions = self.functions
+        bias = self.module.bias if self.bias is None else self.bias
+        activated = []
+        for cells, dendrites, spines, axons, dendrite_segments, cell_segments in self.layers:
+            # spines and synapses
+            axon_active = self.axon_inputs[..., self.topology.spine_axon[spines]]
+            connected = self.spine_connected[..., spines].copy()
+            # synapses update only where their spine was already connected
+            strength, potential = functions.update_synapse(
+                self.spine_exciter[spines], axon_active, self.synapse_strength[..., spines], bias)
+            np.copyto(self.synapse_strength[..., spines], strength, where=connected)
+            np.copyto(self.synapse_potential[..., spines], potential, where=connected)
+            self.spine_length[..., spines], self.spine_connected[..., spines], self.spine_potential[..., spines] = \
+                functions.update_spine(axon_active, self.synapse_potential[..., spines],
+                                       self.spine_length[..., spines], connected, self.spine_potential[..., spines])
+            # dendrites, then cells, then their axons
+            self.dendrite_potential[..., dendrites] = \
+                functions.update_dendrite(self.spine_potential[..., spines], dendrite_segments)
+            self.cell_potential[..., cells], self.cell_active[..., cells] = functions.update_cell(
+                self.dendrite_potential[..., dendrites], cell_segments,
+                self.cell_injected_potential[..., cells], self.cell_firing_threshold[cells])
+            active = self.cell_active[..., self.topology.axon_cell[axons]]
+            rising = active & ~self.axon_active[..., axons]
+            activated.append(axons.start + np.flatnonzero(rising if rising.ndim == 1 else rising.any(axis=0)))
+            self.axon_active[..., axons] = active
+        self.activated = np.concatenate(activated) if activated else np.zeros(0, dtype=np.intp)
+
+    def on_tick_events(self):
+        """ on_tick() in event driven mode: update the awake spines, and what they change """
+        functions = self.functions
+        topology = self.topology
+        awake = self.awake
+        next_awake = []     # spines to update on the next tick
+        dirty_nodes = []
+        activated = []
+        for cells, dendrites, spines, axons, _, cell_segments in self.layers:
+            first, last = np.searchsorted(awake, (spines.start, spines.stop))
+            index = awake[first:last]
+            if len(index):
+                # spines and synapses, as on_tick() but gathered
+                axon_active = self.axon_inputs[topology.spine_axon[index]]
+                connected = self.spine_connected[index]
+                old_strength = self.synapse_strength[index]
+                old_synapse_potential = self.synapse_potential[index]
+                old_length = self.spine_length[index]
+                old_potential = self.spine_potential[index]
+                strength, synapse_potential = functions.update_synapse(
+                    self.spine_exciter[index], axon_active, old_strength, self.module.bias)
+                strength = np.where(connected, strength, old_strength)
+                synapse_potential = np.where(connected, synapse_potential, old_synapse_potential)
+                length, now_connected, potential = functions.update_spine(
+                    axon_active, synapse_potential, old_length, connected, old_potential)
+                changed = (strength != old_strength) | (synapse_potential != old_synapse_potential) | \
+                    (length != old_length) | (now_connected != connected) | (potential != old_potential)
+                self.synapse_strength[index] = strength
+                self.synapse_potential[index] = synapse_potential
+                self.spine_length[index] = length
+                self.spine_connected[index] = now_connected
+                self.spine_potential[index] = potential
+                # changed spines stay awake; the others are at rest
+                changed_spines = index[changed]
+                next_awake.append(changed_spines)
+                dirty_nodes.append(topology.spine_node[changed_spines])
+                # dendrites with a changed spine
+                changed_dendrites = np.unique(topology.spine_dendrite[changed_spines])
+                if len(changed_dendrites):
+                    dendrite_spines, counts = expand(topology.dendrite_spine_offsets, changed_dendrites)
+                    self.dendrite_potential[changed_dendrites] = \
+                        functions.update_dendrite(self.spine_potential[dendrite_spines], Segments(counts))
+                    locations, _ = expand(topology.dendrite_location_offsets, changed_dendrites)
+                    dirty_nodes.append(topology.dendrite_location_node[locations])
+            # cells, then their axons
+            old_cell_potential = self.cell_potential[cells].copy()
+            self.cell_potential[cells], self.cell_active[cells] = functions.update_cell(
+                self.dendrite_potential[dendrites], cell_segments,
+                self.cell_injected_potential[cells], self.cell_firing_threshold[cells])
+            dirty_nodes.append(topology.cell_node[cells][self.cell_potential[cells] != old_cell_potential])
+            active = self.cell_active[topology.axon_cell[axons]]
+            changed_axons = axons.start + np.flatnonzero(active != self.axon_active[axons])
+            self.axon_active[axons] = active
+            activated.append(changed_axons[active[changed_axons - axons.start]])
+            if len(changed_axons):
+                # wake the spines of the changed axons: those of later layers read them on this tick,
+                # the others on the next
+                positions, _ = expand(topology.axon_spine_offsets, changed_axons)
+                woken = topology.axon_spines[positions]
+                later = woken >= spines.stop
+                next_awake.append(woken[~later])
+                if later.any():
+                    awake = np.union1d(awake, woken[later])
+        self.awake = np.unique(np.concatenate(next_awake)) if next_awake else np.zeros(0, dtype=np.intp)
+        self.activated = np.concatenate(activated) if activated else np.zeros(0, dtype=np.intp)
+        if self.dirty_nodes is not None:
+            self.dirty_nodes = np.concatenate([self.dirty_nodes] + dirty_nodes)
+
+    def _fast_forward_spines(self, ticks: int):
+        """ closed form of 'ticks' updates of the scheduled spines and synapses """
+        spines = self.scheduled[2]
+        return self.functions.fast_forward(
+            ticks, self.spine_exciter[spines], self.axon_inputs[..., self.topology.spine_axon[spines]],
+            self.spine_length[..., spines], self.spine_connected[..., spines], self.spine_potential[..., spines],
+            self.synapse_strength[..., spines], self.synapse_potential[..., spines])
+
+    def _settled_for(self, ticks: int) -> bool:
+        """ True if no cell can change state over the next 'ticks' ticks """
+        cells, dendrites, spines, axons = self.scheduled
+        dendrite_segments, cell_segments = self.scheduled_segments
+        low, high = self._fast_forward_spines(ticks)[5:]
+        # cell potentials follow the bounds of their spines' potentials
+        _, active_low = self.functions.update_cell(
+            self.functions.update_dendrite(low, dendrite_segments), cell_segments,
+            self.cell_injected_potential[..., cells], self.cell_firing_threshold[cells])
+        _, active_high = self.functions.update_cell(
+            self.functions.update_dendrite(high, dendrite_segments), cell_segments,
+            self.cell_injected_potential[..., cells], self.cell_firing_threshold[cells])
+        active = self.cell_active[..., cells]
+        return bool(np.all(np.where(active, active_low, ~active_high)))
+
+    def settled_ticks(self, limit: int) -> int:
+        """
+        The number of ticks, up to limit, that fast_forward() can advance: the stretch over which, with the inputs
+        held as they are, no cell changes state and so every axon's activity is constant.
+        """
+        axons = self.scheduled[3]
+        self.read_bridges()
+        if self.functions.fast_forward is None or limit < 1 or \
+                np.any(self.axon_active[..., axons] != self.cell_active[..., self.topology.axon_cell[axons]]) or \
+                any(axon.active != axon.source.active for axon in self.topology.bridge_axons):
+            return 0
+        # the bounds only widen with the length of the stretch: try the shortest and longest stretches,
+        # then find the longest settled one by bisection
+        if not self._settled_for(1):
+            return 0
+        if self._settled_for(limit):
+            return limit
+        settled, unsettled = 1, limit
+        while unsettled - settled > 1:
+            ticks = (settled + unsettled) // 2
+            if self._settled_for(ticks):
+                settled = ticks
+            else:
+                unsettled = ticks
+        return settled
+
+    def fast_forward(self, ticks: int):
+        """ Advance 'ticks' settled ticks (see settled_ticks()) in closed form. Node potentials are not updated. """
+        cells, dendrites, spines, axons = self.scheduled
+        dendrite_segments, cell_segments = self.scheduled_segments
+        self.spine_length[..., spines], self.spine_connected[..., spines], self.spine_potential[..., spines], \
+            self.synapse_strength[..., spines], self.synapse_potential[..., spines], _, _ = \
+            self._fast_forward_spines(ticks)
+        self.dendrite_potential[..., dendrites] = \
+            self.functions.update_dendrite(self.spine_potential[..., spines], dendrite_segments)
+        self.cell_potential[..., cells], self.cell_active[..., cells] = self.functions.update_cell(
+            self.dendrite_potential[..., dendrites], cell_segments,
+            self.cell_injected_potential[..., cells], self.cell_firing_threshold[cells])
+        self.axon_active[..., axons] = self.cell_active[..., self.topology.axon_cell[axons]]
+        # settled: no axon has changed
+        self.activated = np.zeros(0, dtype=np.intp)
+        self.wake()
+
+    def nodes_on_tick(self):
+        """ Update the module's grid of node potentials, as Node.on_tick() does for each (occupied) node. """
+        if self.module.event_driven and self.dirty_nodes is not None:
+            self.nodes_on_tick_events()
+            return
+        self.dirty_nodes = np.zeros(0, dtype=np.intp)
+        self.node_potential[..., self.node_grid] = self.functions.update_node(
+            self.cell_potential[..., self.node_cells], self.node_cell_segments,
+            self.dendrite_potential[..., self.node_dendrites], self.node_dendrite_segments,
+            self.spine_connected[..., self.node_spines], self.synapse_potential[..., self.node_spines],
+            self.node_spine_segments)
+
+    def nodes_on_tick_events(self):
+        """ nodes_on_tick() in event driven mode: update the nodes where a component changed """
+        nodes = np.unique(self.dirty_nodes)
+        self.dirty_nodes = np.zeros(0, dtype=np.intp)
+        if not len(nodes):
+            return
+        cells, cell_counts = expand(self.node_cell_segments.offsets, nodes)
+        dendrites, dendrite_counts = expand(self.node_dendrite_segments.offsets, nodes)
+        spines, spine_counts = expand(self.node_spine_segments.offsets, nodes)
+        cells, dendrites, spines = self.node_cells[cells], self.node_dendrites[dendrites], self.node_spines[spines]
+        self.node_potential[self.node_grid[nodes]] = self.functions.update_node(
+            self.cell_potential[cells], Segments(cell_counts),
+            self.dendrite_potential[dendrites], Segments(dendrite_counts),
+            self.spine_connected[spines], self.synapse_potential[spines], Segments(spine_counts))
@@ -0,0 +1,147 @@
+"""
+    Program: ALBERT
+    Module: ensemble.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Ensemble: trains a number of independent copies (replicas) of the brain in model_spec.py together, each with its own
+trainer, in single vectorized ticks over one shared topology (see Engine), eg:
+
+    python ensemble.py --replicas 32 --seconds 150
+
+Replicas start from the same state and differ by the training data presented to them: with randomise, each
+trainer draws its rows from its own seed; otherwise each replica starts at a different row of the training data.
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from actor import Actor
+from trainer import Trainer
+from model_spec import UPS, TRAINING_CYCLES, training_data, cell_types, brain
+
+
+class Ensemble:
+    """
+    Ensemble runs replicas of a brain in the array engines of one Actor's brain. Before each replica's trainer
+    updates the sensors and biases, the brain's objects are pointed at that replica (see show()), and the biases
+    it sets are copied to the engines; every tick then advances all the replicas at once.
+
+    Bridges and worker processes are not replicated: they see the replica last shown.
+    """
+
+    def __init__(self, replicas: int, randomise: bool = False, fast_forward: bool = False, seed: int = 123456789):
+        """
+        :param replicas: number of copies of the brain
+        :param randomise: present training rows in random order (see Trainer)
+        :param fast_forward: advance stretches over which every replica has settled in closed form (see Actor)
+        """
+        self.replicas = replicas
+        self.trainers = [Trainer(randomise=randomise, seed=seed + replica) for replica in range(replicas)]
+        self.actor = Actor(None, brain, cell_types, UPS, self.trainers[0])
+        self.brain = self.actor.brain
+        self.brain.worker_count = 0
+        self.actor.fast_forward = fast_forward
+        for module in self.brain.modules:
+            # replicas share their connectivity, so every spine is created at once, and none is evicted
+            if module.latent is not None:
+                module.spine_budget = 0
+                module.latent.materialise_all()
+            module.event_driven = False
+            module.array_engine = True
+            module.replicas = replicas
+            module.compile()
+            if module.engine.functions.wrapped:
+                raise ValueError(f"an ensemble needs the array version of {module.engine.functions.wrapped}")
+        for replica, trainer in enumerate(self.trainers):
+            trainer.brain = self.brain
+            if not randomise:
+                trainer.data_row = {key: replica % len(data['values']) for key, data in training_data.items()}
+
+    @property
+    def time_alive(self) -> int:
+        return self.actor.time_alive
+
+    def show(self, replica: int):
+        """ point the brain's objects (and so state dumps and the trainer) at one replica """
+        for module in self.brain.modules:
+            module.engine.show(replica)
+
+    def _train_replicas(self):
+        """ update the sensors and biases of every replica, as the trainer does once a second for a single brain """
+        for replica, trainer in enumerate(self.trainers):
+            self.show(replica)
+            trainer.on_tick()
+            for module in self.brain.modules:
+                module.engine.bias[replica] = module.bias
+
+    def train(self, ticks: int):
+        """ Run the replicas for a number of ticks, each trained at the start of each second (see Actor.train()) """
+        while ticks > 0:
+            update = self.actor.time_alive % UPS
+            if update == 0:
+                self._train_replicas()
+            stretch = min(ticks, UPS - update)
+            self.actor.advance(stretch)
+            ticks -= stretch
+
+    def state(self, replica: int) -> dict:
+        """ state dump of one replica (see Brain.on_state_dump()) """
+        self.show(replica)
+        return self.brain.on_state_dump()
+
+    def motor_active(self, module_key: str) -> np.ndarray:
+        """ activity of the module's motor cells (training_data 'motor_keys'), a row per replica """
+        module = next(module for module in self.brain.modules if module.key == module_key)
+        indices = [module.cells[key].index for key in training_data[module_key]['motor_keys'] if key in module.cells]
+        return module.engine.cell_active[:, indices]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='ALBERT ensemble: train replicas of the brain in one array pass')
+    parser.add_argument('--replicas', type=int, default=16)
+    parser.add_argument('--seconds', type=int, default=TRAINING_CYCLES + 20, help=f'seconds ({UPS} ticks each)')
+    parser.add_argument('--randomise', action='store_true', help='present the training rows in random order')
+    parser.add_argument('--fast-forward', action='store_true')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    ensemble = Ensemble(args.replicas, args.randomise, args.fast_forward)
+    scores = {key: [] for key, data in training_data.items() if 'expected' in data}
+    t_start = time.perf_counter()
+    for _ in range(args.seconds):
+        ensemble.train(UPS)
+        for key in scores:
+            expected = training_data[key]['expected']
+            rows = [trainer.presented_row.get(key) for trainer in ensemble.trainers]
+            if None not in rows:
+                scores[key].append(ensemble.motor_active(key) == np.array([expected[row] for row in rows]))
+    run_time = time.perf_counter() - t_start
+    ticks = args.seconds * UPS
+    print(f"{args.replicas} replicas x {ticks} ticks in {run_time:.2f} s: "
+          f"{args.replicas * ticks / run_time:.0f} replica ticks per second")
+    for key, module_scores in scores.items():
+        if module_scores:
+            accuracy = np.mean(module_scores, axis=(0, 2))
+            print(f"{key} accuracy by replica: {np.round(accuracy, 2).tolist()}")
@@ -0,0 +1,123 @@
+"""
+    Program: ALBERT
+    Module: headless.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Headless entry point: trains the brain in model_spec.py as fast as possible, with no monitor and no wall-clock
+pacing, then writes its final state and timing statistics, eg:
+
+    python headless.py --seconds 150 --array-engine --fast-forward --output final_state.pkl
+    python headless.py --seconds 100 --checkpoint trained.npz
+    python headless.py --seconds 50 --resume trained.npz
+
+The output file is a pickled dictionary: {'state': Brain.on_state_dump(), 'timing': statistics}.
+"""
+
+import argparse
+import logging
+import pickle
+import time
+
+from actor import Actor
+from checkpoint import save, load
+from trainer import Trainer
+from constants import *
+from model_spec import UPS, TRAINING_CYCLES, ARRAY_ENGINE, EVENT_DRIVEN, FAST_FORWARD, WORKERS, cell_types, brain
+
+
+def build(array_engine: bool = ARRAY_ENGINE, event_driven: bool = EVENT_DRIVEN, fast_forward: bool = FAST_FORWARD,
+          workers: int = WORKERS, randomise: bool = False) -> Actor:
+    """ an actor, with no pipe or monitor, for the brain and training data in model_spec.py """
+    actor = Actor(None, brain, cell_types, UPS, Trainer(randomise=randomise))
+    actor.brain.worker_count = workers
+    for module in actor.brain.modules:
+        module.event_driven = event_driven
+        if array_engine and module.engine is None:
+            module.array_engine = True
+            module.compile()
+    actor.fast_forward = fast_forward
+    return actor
+
+
+def run(actor: Actor, ticks: int) -> dict:
+    """
+    Train the actor's brain for a number of ticks.
+
+    :return: timing statistics, of these ticks only (not those before a checkpoint the actor was resumed from)
+    """
+    fast_forwarded = actor.ticks_fast_forwarded
+    t_start = time.perf_counter()
+    actor.train(ticks)
+    run_time = time.perf_counter() - t_start
+    return {
+        'ticks': ticks,
+        'run_seconds': run_time,
+        'ticks_per_second': ticks / run_time if run_time > 0 else float('inf'),
+        'ms_per_tick': run_time / ticks * 1000 if ticks else 0.0,
+        'real_time_factor': ticks / UPS / run_time if run_time > 0 else float('inf'),
+        'ticks_fast_forwarded': actor.ticks_fast_forwarded - fast_forwarded,
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='ALBERT headless runner')
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument('--seconds', type=int, help=f'seconds of model time ({UPS} ticks each), '
+                                                    f'default TRAINING_CYCLES = {TRAINING_CYCLES}')
+    length.add_argument('--ticks', type=int, help='number of ticks')
+    parser.add_argument('--array-engine', action=argparse.BooleanOptionalAction, default=ARRAY_ENGINE)
+    parser.add_argument('--event-driven', action=argparse.BooleanOptionalAction, default=EVENT_DRIVEN)
+    parser.add_argument('--fast-forward', action=argparse.BooleanOptionalAction, default=FAST_FORWARD,
+                        help='advance settled stretches in closed form (implies --array-engine)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes for the modules (> 1)')
+    parser.add_argument('--randomise', action='store_true', help='present the training data in random order')
+    parser.add_argument('--output', default='final_state.pkl', help='file for the final state and timings')
+    parser.add_argument('--resume', help='checkpoint to carry on from (see checkpoint.py)')
+    parser.add_argument('--checkpoint', help='file for a checkpoint of the final state')
+    parser.add_argument('--log', default='headless.log', help='log file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, filename=args.log, filemode='w', format='%(message)s\t\t')
+    ticks = args.ticks if args.ticks is not None else (args.seconds or TRAINING_CYCLES) * UPS
+
+    t_build = time.perf_counter()
+    actor = build(args.array_engine or args.fast_forward, args.event_driven, args.fast_forward, args.workers,
+                  args.randomise)
+    if args.resume:
+        load(actor, args.resume)
+    build_time = time.perf_counter() - t_build
+    timing = run(actor, ticks)
+    if args.checkpoint:
+        save(actor, args.checkpoint)
+    actor.brain.stop_workers()
+    timing['build_seconds'] = build_time
+
+    state = actor.brain.on_state_dump()
+    state[TIME_ALIVE_CYCLES] = actor.time_alive
+    with open(args.output, 'wb') as file:
+        pickle.dump({STATE: state, TIMING: timing}, file)
+
+    for name, value in timing.items():
+        logging.info(f"{name:22}{value}")
+    print(f"{timing['ticks']} ticks in {timing['run_seconds']:.2f} s: {timing['ticks_per_second']:.0f} ticks/s "
+          f"({timing['ms_per_tick']:.3f} ms/tick, {timing['real_time_factor']:.1f}x real time, "
+          f"{timing['ticks_fast_forwarded']} fast-forwarded), built in {build_time:.2f} s -> {args.output}")
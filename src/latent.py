@@ -0,0 +1,267 @@
+"""
+    Program: ALBERT
+    Module: latent.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import numpy as np
+
+from spine import Spine
+from batch_functions import Item
+from constants import *
+from model_spec import UserFunctions, UPS
+
+
+class LatentSpines:
+    """
+    LatentSpines holds the spines of a module that have not been created yet (LAZY_SPINES = True), or that have been
+    evicted to keep the module within its spine budget (SPINE_BUDGET > 0): each potential
+    dendrite-axon pairing at a node is recorded as a few integers, and its Spine and Synapse are only created
+    (materialised) at the end of the tick on which its axon first becomes active.
+
+    Until then the spine is at rest: unconnected, at REST_POTENTIAL, with its synapse at its initial strength, and at
+    the length that an update with its axon inactive gives it (MIN_LENGTH under the rules in model_spec.py).
+    A spine is created in that state, and a spine that would already have seen its axon active on the tick that
+    materialises it (one in a later layer of cells) is updated once, so the model runs exactly as if every spine
+    had been created when the nodes connected. Unmaterialised spines are missing from state dumps, and the plots
+    treat them as resting (see DataTranslator).
+
+    The ids of the spines and synapses are allocated when the pairings are recorded, so their keys are the same
+    as those of spines created at once.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.ticks = 0              # ticks of the module so far
+        # one entry per latent spine: node location, dendrite and axon (indices in module.dendrites and
+        # module.axons), and the ids of the spine and its synapse
+        self.location = np.zeros((0, len(module.dimensions)), dtype=np.int32)
+        self.dendrite = np.zeros(0, dtype=np.int32)
+        self.axon = np.zeros(0, dtype=np.int32)
+        self.spine_id = np.zeros(0, dtype=np.int32)
+        self.synapse_id = np.zeros(0, dtype=np.int32)
+        # latent axons (indices in module.axons) and, in array engine mode, their indices in the engine, sorted,
+        # with the position of each in _axons
+        self._axons = None
+        self._engine = None
+        self._engine_axons = None
+        self._engine_order = None
+        # every latent axon is to be checked on the next tick, not just those that became active (see Engine.activated)
+        self._check_all = True
+
+    def __len__(self):
+        return len(self.spine_id)
+
+    def extend(self, location, dendrite, axon, spine_id, synapse_id):
+        """ record potential spines, in place of creating them (see templates.build_cells()) """
+        location = np.asarray(location, dtype=np.int32).reshape(-1, self.location.shape[1])
+        self.location = np.concatenate([self.location, location])
+        self.dendrite = np.concatenate([self.dendrite, np.asarray(dendrite, dtype=np.int32)])
+        self.axon = np.concatenate([self.axon, np.asarray(axon, dtype=np.int32)])
+        self.spine_id = np.concatenate([self.spine_id, np.asarray(spine_id, dtype=np.int32)])
+        self.synapse_id = np.concatenate([self.synapse_id, np.asarray(synapse_id, dtype=np.int32)])
+        self._axons = None
+
+    def _active_axons(self) -> np.ndarray:
+        """
+        The latent axons (indices in module.axons) that are active. In array engine mode, after the first check,
+        only the axons that became active on this tick are looked up, so that a quiet tick costs next to nothing.
+        """
+        if self._axons is None:
+            self._axons = np.unique(self.axon)
+            self._engine = None
+        axons = self.module.axons
+        engine = self.module.engine
+        if engine is None:
+            return self._axons[[axons[index].active for index in self._axons.tolist()]]
+        if self._engine is not engine:
+            self._engine = engine
+            engine_axons = np.array([axons[index].index for index in self._axons.tolist()], dtype=np.intp)
+            self._engine_order = np.argsort(engine_axons)
+            self._engine_axons = engine_axons[self._engine_order]
+        if self._check_all:
+            self._check_all = False
+            return self._axons[self._engine_order[engine.axon_active[self._engine_axons]]]
+        activated = engine.activated
+        if not len(activated) or not len(self._engine_axons):
+            return self._axons[:0]
+        positions = np.searchsorted(self._engine_axons, activated).clip(max=len(self._engine_axons) - 1)
+        positions = positions[self._engine_axons[positions] == activated]
+        return self._axons[self._engine_order[positions]]
+
+    def on_tick(self) -> bool:
+        """
+        At the end of a tick of the module: materialise the spines of the axons that have become active, then,
+        if the module has more spines than its budget (spine_budget), evict dormant ones (see evict()).
+
+        :return: True if any spine was materialised or evicted, ie the module must be recompiled
+        """
+        updated = self.ticks > 0
+        self.ticks += 1
+        changed = False
+        if len(self):
+            active = self._active_axons()
+            if len(active):
+                self.materialise(np.isin(self.axon, active), updated, True)
+                changed = True
+        # over budget: look for dormant spines when spines have been created, and once a second
+        budget = self.module.spine_budget
+        if budget and len(self.module.spines) > budget and (changed or self.ticks % UPS == 1):
+            changed = self.evict(len(self.module.spines) - budget) > 0 or changed
+        return changed
+
+    def materialise_all(self):
+        """
+        Materialise every latent spine, eg before the connectivity of the module is fixed (see ModuleWorkers).
+        Exact before the first tick; afterwards, spines whose axons are active start from rest.
+        """
+        if len(self):
+            if self.module.topology is None:
+                self.module.compile()
+            self.materialise(np.ones(len(self), dtype=bool), self.ticks > 0, False)
+            self.module.compile()
+
+    def materialise(self, selected: np.ndarray, updated: bool, seen: bool):
+        """
+        Create the selected spines in their resting state, and remove them from the latent spines.
+
+        :param updated: the spines have been updated before this tick
+        :param seen: the spines have been updated on this tick, on which their axons became active
+        """
+        module = self.module
+        topology = module.topology
+        # position of each cell in the schedule and its layer: cells beyond the schedule are never updated
+        position = {cell: index for index, cell in enumerate(topology.cells)}
+        scheduled = topology.layer_offsets[-1]
+        layers = topology.layer_offsets
+        indices = np.flatnonzero(selected)
+        for index in indices.tolist():
+            dendrite = module.dendrites[int(self.dendrite[index])]
+            axon = module.axons[int(self.axon[index])]
+            location = tuple(int(value) for value in self.location[index])
+            spine = Spine(module, location, dendrite, axon, int(self.spine_id[index]), int(self.synapse_id[index]))
+            dendrite_position = position[dendrite.parent]
+            if dendrite_position < scheduled:
+                # updated after the axon on this tick: later in the schedule, or in a later layer of the engine
+                axon_position = position[axon.parent]
+                if module.engine is None:
+                    later = dendrite_position > axon_position
+                else:
+                    later = np.searchsorted(layers, dendrite_position, 'right') > \
+                        np.searchsorted(layers, axon_position, 'right')
+                if updated or (seen and not later):
+                    spine.length, spine.connected, spine.potential = UserFunctions.update_spine(
+                        Item(active=False), spine.synapse, spine.length, spine.connected, spine.potential)
+                if seen and later:
+                    spine.on_tick()
+            module.nodes[location].spines.append(spine)
+            dendrite.spines.append(spine)
+            dendrite.awake.add(spine)
+            axon.spines.append(spine)
+            module.spines.append(spine)
+            module.synapses.append(spine.synapse)
+        keep = ~selected
+        self.location, self.dendrite, self.axon = self.location[keep], self.dendrite[keep], self.axon[keep]
+        self.spine_id, self.synapse_id = self.spine_id[keep], self.synapse_id[keep]
+        self._axons = None
+
+    def evict(self, count: int) -> int:
+        """
+        Return up to count dormant spines to the latent spines, least recently active first, so that they are
+        compacted out of the module's arrays on the next compile(), and created again when their axon next becomes
+        active. Only unconnected spines whose axon is inactive are dormant; the shortest have been dormant longest,
+        as an unconnected spine shrinks on every update while its axon is inactive. A spine shrunk to its resting
+        length is evicted exactly; a longer one is created again from rest.
+
+        :return: number of spines evicted
+        """
+        module = self.module
+        if module.engine is not None and module.topology is not None:
+            engine, topology = module.engine, module.topology
+            spines = topology.spines
+            # the spines of bridges are not the module's to evict
+            own = topology.spine_axon < len(topology.axons)
+            dormant = np.flatnonzero(own & ~engine.spine_connected & ~engine.axon_inputs[topology.spine_axon])
+            order = np.lexsort((np.array([spines[index].id for index in dormant.tolist()], dtype=np.intp),
+                                engine.spine_length[dormant]))
+            evicted = [spines[index] for index in dormant[order[:count]].tolist()]
+        else:
+            dormant = [spine for spine in module.spines if not spine.connected and not spine.axon.active]
+            evicted = sorted(dormant, key=lambda spine: (spine.length, spine.id))[:count]
+        if not evicted:
+            return 0
+        dendrite_index = {dendrite: index for index, dendrite in enumerate(module.dendrites)}
+        axon_index = {axon: index for index, axon in enumerate(module.axons)}
+        self.extend([spine.location for spine in evicted], [dendrite_index[spine.dendrite] for spine in evicted],
+                    [axon_index[spine.axon] for spine in evicted], [spine.id for spine in evicted],
+                    [spine.synapse.id for spine in evicted])
+        self._remove(evicted)
+        return len(evicted)
+
+    def _remove(self, spines: list):
+        """ remove spines from the components holding them """
+        module = self.module
+        gone = set(spines)
+        for spine in spines:
+            spine.dendrite.awake.discard(spine)
+        for holder in {holder for spine in spines
+                       for holder in (module.nodes[spine.location], spine.dendrite, spine.axon)}:
+            holder.spines = [spine for spine in holder.spines if spine not in gone]
+        module.spines = [spine for spine in module.spines if spine not in gone]
+        module.synapses = [spine.synapse for spine in module.spines]
+
+    def records(self):
+        """
+        Every potential spine of the module, eg for a checkpoint: the latent spines, then the spines of the module
+        (other than those of bridges).
+
+        :return: arrays of location, dendrite, axon, spine_id and synapse_id, by name, and whether each spine
+                 has been materialised
+        """
+        module = self.module
+        dendrite_index = {dendrite: index for index, dendrite in enumerate(module.dendrites)}
+        axon_index = {axon: index for index, axon in enumerate(module.axons)}
+        spines = module.spines
+        records = {
+            'location': np.concatenate([self.location, np.array([spine.location for spine in spines],
+                                                                dtype=np.int32).reshape(-1, self.location.shape[1])]),
+            'dendrite': np.concatenate([self.dendrite, [dendrite_index[spine.dendrite] for spine in spines]]),
+            'axon': np.concatenate([self.axon, [axon_index[spine.axon] for spine in spines]]),
+            'spine_id': np.concatenate([self.spine_id, [spine.id for spine in spines]]),
+            'synapse_id': np.concatenate([self.synapse_id, [spine.synapse.id for spine in spines]]),
+        }
+        records = {name: array.astype(np.int32) for name, array in records.items()}
+        materialised = np.concatenate([np.zeros(len(self), dtype=bool), np.ones(len(spines), dtype=bool)])
+        return records, materialised
+
+    def restore(self, records: dict, materialised: np.ndarray, ticks: int):
+        """
+        Replace the spines of the module (other than those of bridges) and its latent spines with those recorded
+        by records(), eg from a checkpoint: the materialised spines are created at rest, in their recorded order.
+        """
+        module = self.module
+        self._remove(list(module.spines))
+        self.location, self.dendrite, self.axon = records['location'], records['dendrite'], records['axon']
+        self.spine_id, self.synapse_id = records['spine_id'], records['synapse_id']
+        self._axons = None
+        self._check_all = True
+        self.ticks = ticks
+        module.compile()
+        self.materialise(materialised, False, False)
+        module.compile()
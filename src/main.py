@@ -22,11 +22,13 @@ __status__ = "Production"
 
 from multiprocessing import Pipe, Process
 import logging
+import os
 # app modules
 from monitor import Monitor
 from actor import Actor
 from trainer import Trainer
-from model_spec import UPS, cell_types, brain, plot_request
+from checkpoint import load
+from model_spec import UPS, cell_types, brain, plot_request, RESUME, CHECKPOINT_FILE
 
 # main process...
 if __name__ == "__main__":
@@ -44,6 +46,9 @@ if __name__ == "__main__":
     monitor = Monitor(monitor_connection, plot_request, profiling=False)
     # make actor
     actor = Actor(actor_connection, brain, cell_types, UPS, trainer, monitor, profiling=False)
+    # carry on from the last checkpoint, instead of training from the start
+    if RESUME and os.path.exists(CHECKPOINT_FILE):
+        load(actor, CHECKPOINT_FILE)
     # start actor in separate process
     Process(target=actor.live, args=()).start()
     # start monitor
@@ -24,6 +24,8 @@ __status__ = "Production"
 User-defined constants, model update functions and model data.
 """
 
+import numpy as np
+
 # cells
 REST_POTENTIAL = -70
 FIRING_POTENTIAL = 0
@@ -58,6 +60,19 @@ BIAS_OFF = DV_EXCITE
 
 UPS = 60    # updates per second
 DPS = 6     # model data dumps per second
+SCROLLBACK = 0          # seconds of each line plot held beyond its visible x-range (see Plotter.SubPlot.Lines)
+BLIT = True             # True: redraw only the plots' changing artists, with every data dump (see Plotter.refresh())
+ARRAY_ENGINE = False    # True: hold component state in numpy arrays and update a layer of cells at once
+EVENT_DRIVEN = False    # True: skip spines at rest until their axon changes state
+FAST_FORWARD = False    # True: advance settled stretches in closed form (needs ARRAY_ENGINE), see Actor.advance()
+WORKERS = 0             # > 1: step the modules in up to this many worker processes (see workers.py)
+LAZY_SPINES = False     # True: create each spine when its axon first becomes active (see latent.py)
+SPINE_BUDGET = 0        # > 0: most spines kept in a module; dormant spines are evicted beyond it (see latent.py)
+CHECKPOINT_SECONDS = 0  # > 0: checkpoint the actor every this many seconds of model time (see checkpoint.py)
+CHECKPOINT_FILE = 'checkpoint.npz'
+RESUME = False          # True: resume from CHECKPOINT_FILE, if there is one (see main.py)
+TRACE_TICKS = 0         # > 0: record trace_request on every tick, in a ring of this many ticks (see recorder.py)
+TRACE_FILE = 'trace.npy'
 
 
 class UserFunctions:
@@ -117,6 +132,121 @@ class UserFunctions:
                    [dendrite.potential for dendrite in dendrites] +
                    [REST_POTENTIAL + spine.synapse.potential for spine in spines if spine.connected])
 
+    # Array versions of the update functions, used by the array engine (ARRAY_ENGINE = True).
+    # Each argument is a numpy array holding one value per component, except for bias.
+    # A missing *_batch function is replaced by its scalar version applied element by element (see batch_functions.py),
+    # and 'python batch_functions.py' checks each *_batch function against its scalar version on random inputs.
+
+    @staticmethod
+    def update_cell_batch(dendrite_potential, segments, injected_potential, firing_threshold):
+        """
+        :param dendrite_potential: potentials of the dendrites of all the cells, cell by cell
+        :param segments: dendrites of each cell, as Segments of dendrite_potential (see topology.py)
+        :return: potential, active
+        """
+        potential = np.maximum(segments.max(dendrite_potential, REST_POTENTIAL), injected_potential)
+        return potential, potential > firing_threshold
+
+    @staticmethod
+    def update_dendrite_batch(spine_potential, segments):
+        """
+        :param spine_potential: potentials of the spines of all the dendrites, dendrite by dendrite
+        :param segments: spines of each dendrite, as Segments of spine_potential (see topology.py)
+        :return: potential
+        """
+        return segments.max(spine_potential, REST_POTENTIAL)
+
+    @staticmethod
+    def update_spine_batch(axon_active, synapse_potential, length, connected, potential):
+        change_rate = np.where(axon_active, SPINE_GROWTH_RATE, SPINE_DECAY_RATE)
+        grown = np.maximum(length * change_rate, MIN_LENGTH)
+        decayed = np.maximum(SPINE_POTENTIAL_DECAY * (potential - REST_POTENTIAL) + REST_POTENTIAL, synapse_potential)
+        return np.where(connected, length, grown), \
+            connected | (grown >= CONNECT_LENGTH), \
+            np.where(connected, decayed, REST_POTENTIAL)
+
+    @staticmethod
+    def update_synapse_batch(exciter, axon_active, strength, bias: float):
+        strength = np.where(axon_active,
+                            np.minimum(strength * SYNAPSE_GROWTH_RATE, MAX_STRENGTH),
+                            np.maximum(strength * SYNAPSE_DECAY_RATE, MIN_STRENGTH))
+        dv = np.where(exciter, DV_EXCITE, DV_INHIBIT)
+        norm_strength = strength / MAX_STRENGTH
+        potential = np.where(axon_active, dv * norm_strength + REST_POTENTIAL, REST_POTENTIAL)
+        return strength, potential
+
+    @staticmethod
+    def update_node_batch(cell_potential, cell_segments, dendrite_potential, dendrite_segments,
+                          spine_connected, synapse_potential, spine_segments):
+        """
+        :param cell_segments, dendrite_segments, spine_segments: Segments grouping the values before them by node
+        :return: potential of every node
+        """
+        spine_potential = np.where(spine_connected, REST_POTENTIAL + synapse_potential, REST_POTENTIAL)
+        return np.maximum.reduce([cell_segments.max(cell_potential, REST_POTENTIAL),
+                                  dendrite_segments.max(dendrite_potential, REST_POTENTIAL),
+                                  spine_segments.max(spine_potential, REST_POTENTIAL)])
+
+    # Closed form of repeated spine and synapse updates, used to fast-forward settled stretches (FAST_FORWARD = True).
+    # It must be kept in step with update_spine and update_synapse: 'python benchmark.py fastforward' compares it
+    # with step by step updates. Without it, the model is always stepped.
+
+    @staticmethod
+    def fast_forward_batch(ticks, exciter, axon_active, length, connected, potential, strength, synapse_potential):
+        """
+        Apply update_synapse and update_spine 'ticks' (>= 1) times, with the activity of each axon held constant.
+
+        Unconnected spines grow or shrink geometrically, clamped at MIN_LENGTH, and connect on the first tick that
+        they reach CONNECT_LENGTH. Synapse strength then grows or decays geometrically between its clamps, and spine
+        potential is the larger of its geometric decay towards REST_POTENTIAL and the synapse potential. Over the
+        stretch, a spine's potential is either monotonic or falls and then rises, so it peaks on the first or last tick.
+
+        :return: length, connected, potential, strength, synapse_potential after 'ticks' updates,
+                 and lower and upper bounds of the spine potential over those updates
+        """
+        dv = np.where(exciter, DV_EXCITE, DV_INHIBIT)
+
+        def synapse(strength, updates):
+            # strength and potential after a number (> 0) of synapse updates
+            strength = np.where(axon_active,
+                                np.minimum(strength * SYNAPSE_GROWTH_RATE ** updates, MAX_STRENGTH),
+                                np.maximum(strength * SYNAPSE_DECAY_RATE ** updates, MIN_STRENGTH))
+            return strength, np.where(axon_active, dv * (strength / MAX_STRENGTH) + REST_POTENTIAL, REST_POTENTIAL)
+
+        # unconnected spines with an active axon grow from 'first' and connect on tick 'connect_tick'
+        first = np.maximum(length * SPINE_GROWTH_RATE, MIN_LENGTH)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth_ticks = np.ceil(np.maximum(np.log(CONNECT_LENGTH / first) / np.log(SPINE_GROWTH_RATE), 0))
+        # correct for rounding of the logarithms
+        early = (growth_ticks > 0) & (first * SPINE_GROWTH_RATE ** (growth_ticks - 1) >= CONNECT_LENGTH)
+        growth_ticks = np.where(early, growth_ticks - 1, growth_ticks)
+        connect_tick = 1 + growth_ticks
+        grows = axon_active & ~connected
+        connects = grows & (connect_tick <= ticks)
+        new_length = np.where(
+            connected, length,
+            np.where(grows, first * SPINE_GROWTH_RATE ** (np.minimum(connect_tick, ticks) - 1),
+                     np.maximum(length * SPINE_DECAY_RATE ** ticks, MIN_LENGTH)))
+        # synapses update on the ticks after their spine connects
+        synapse_ticks = np.where(connected, ticks, np.where(connects, ticks - connect_tick, 0))
+        updated = synapse_ticks > 0
+        new_strength, new_synapse_potential = synapse(strength, np.maximum(synapse_ticks, 1))
+        new_strength = np.where(updated, new_strength, strength)
+        new_synapse_potential = np.where(updated, new_synapse_potential, synapse_potential)
+        start_potential = np.where(connected, potential, REST_POTENTIAL)
+        decayed = SPINE_POTENTIAL_DECAY ** synapse_ticks * (start_potential - REST_POTENTIAL) + REST_POTENTIAL
+        new_potential = np.where(updated, np.maximum(decayed, new_synapse_potential), REST_POTENTIAL)
+        # bounds over the stretch: spines that were not connected rest until they connect, then rise or rest
+        _, first_synapse_potential = synapse(strength, 1)
+        first_potential = np.where(
+            connected,
+            np.maximum(SPINE_POTENTIAL_DECAY * (potential - REST_POTENTIAL) + REST_POTENTIAL, first_synapse_potential),
+            REST_POTENTIAL)
+        low = np.where(connected, np.maximum(decayed, first_synapse_potential), REST_POTENTIAL)
+        high = np.maximum(first_potential, new_potential)
+        return new_length, connected | connects, new_potential, new_strength, new_synapse_potential, low, high
+
+
 training_data = {
     'md-01': {
         'cell_keys': ['bias', 'se-01', 'se-07'],
@@ -126,7 +256,15 @@ training_data = {
             [BIAS_OFF, ON, OFF],
             [BIAS_OFF, OFF, ON],
             [BIAS_ON, OFF, OFF],
-        ]
+        ],
+        # motor cells, and their expected activity for each row of values (scored by sweep.py)
+        'motor_keys': ['mo-14'],
+        'expected': [
+            [False],
+            [True],
+            [True],
+            [False],
+        ],
     },
     'md-02': {
         'cell_keys': ['bias', 'se-16', 'se-22'],
@@ -245,7 +383,24 @@ brain = {  # start brain
         #             "locations": [(6, 3), (6, 5), (6, 7)]
         #         },
         #     },
-        # }  # end module-2
+        # },  # end module-2
+        # {
+        #     "description": "A 200 x 200 module, placed by pattern",
+        #     "dimensions": (200, 200),
+        #     "cells": {
+        #         "sensor": {
+        #             "fill": {"start": (0, 0), "stop": (1, 200)}  # every location of a box
+        #         },
+        #         "pyramid": {
+        #             "tile": {"start": (2, 1), "stop": (196, 197), "step": (4, 4),  # a pattern every 4 rows and cols
+        #                      "pattern": [(0, 0), (2, 2)]},
+        #             "random": {"start": (197, 1), "stop": (199, 199), "density": 0.1, "seed": 1}  # and scattered
+        #         },
+        #         "motor": {
+        #             "tile": {"start": (199, 0), "step": (1, 2)}  # every other location of the last row
+        #         },
+        #     },
+        # }  # end module-3
     ],  # end modules
     # "bridges": [  # instantiate dictionary in each module with locations as keys
     #     {
@@ -265,6 +420,14 @@ brain = {  # start brain
 
 # plots requested
 
+# variables recorded on every tick (TRACE_TICKS > 0); without 'item-keys', those of every item in the module
+
+trace_request = [
+    {'module': 'md-01', 'items': 'cells', 'variable': 'potential'},
+    {'module': 'md-01', 'items': 'spines', 'variable': 'length'},
+    {'module': 'md-01', 'items': 'synapses', 'variable': 'strength', 'item-keys': ['sy-01', 'sy-05', 'sy-17']},
+]
+
 plot_request = [
     {'type': 'figure', 'title': 'ALBERT Test Model'},
     {'type': 'cell-map', 'sub-plot': (1, 1), 'module': 'md-01'},
@@ -21,56 +21,95 @@ __email__ = ""
 __status__ = "Production"
 
 import logging
-import itertools
+from functools import cached_property
+
+import numpy as np
 
 from abs_events import AbsUpdatable
-from cell import Cell
+from engine import Engine
+from topology import Topology
+from latent import LatentSpines
+from templates import build_cells
 
-from node import Node
+from node import NodeGrid
 from constants import *
 
 
-# noinspection PyBroadException
-from model_spec import REST_POTENTIAL, DV_INHIBIT
+from model_spec import REST_POTENTIAL, DV_INHIBIT, ARRAY_ENGINE, EVENT_DRIVEN, LAZY_SPINES, SPINE_BUDGET
 
 
 class Module(AbsUpdatable):
 
-    module_count = 0
-    _module_counter = itertools.count(1)
-
     def __init__(self, brain, module_spec, cell_specs):
         """
         A 2D or 3D collection of nodes providing the spatial scaffolding for cells and bridges.
         """
-        # keep count of created objects
-        Module.module_count = next(self._module_counter)
         # keep reference to host brain
         self.brain = brain
+        # id, unique among the modules of the brain
+        self.id = brain.ids.next(MODULE)
         # module state
-        self.key = f'md-{Module.module_count:02d}'
         self.description = module_spec[DESCRIPTION]
         self.dimensions = module_spec[DIMENSIONS]  # dimensions
         self.bias = REST_POTENTIAL + DV_INHIBIT
+        self.event_driven = EVENT_DRIVEN  # update only the spines that are not at rest
+        self.tick_bias = self.bias  # bias at the last tick: resting spines wake when it changes
         self.cells = {}
         self.axons = []
         self.dendrites = []
         self.spines = []
         self.synapses = []
-        self.nodes = {}  # dictionary of nodes referenced by location tuples
-        # populate the nodes
-        self._create_nodes()
-        # create cells
-        try:
-            for cell_type, cell_spec in module_spec[CELLS].items():
-                self.make_cells(cell_type, cell_spec, cell_specs)
-        except:
+        self.nodes = NodeGrid(self)  # nodes referenced by location tuples, created for occupied locations
+        self.node_potential = np.full(self.dimensions, REST_POTENTIAL, dtype=float)  # node potentials by location
+        self.topology = None  # evaluation schedule and index arrays, compiled once the nodes are connected
+        self.keyed = (None, {})  # the topology, and the components by key of each kind for it (see components())
+        self.array_engine = ARRAY_ENGINE  # hold component state in arrays, from the next compile()
+        self.engine = None  # array store for component state (when array_engine is set)
+        self.replicas = None  # number of copies of the state in the engine (see ensemble.py), None: one
+        self.lazy_spines = LAZY_SPINES  # create each spine when its axon first becomes active
+        self.spine_budget = SPINE_BUDGET  # > 0: most spines kept, evicting dormant ones
+        self.latent = LatentSpines(self) if LAZY_SPINES or SPINE_BUDGET else None  # spines not created or evicted
+        # create cells, and spines to connect axons and dendrites in each node, from the cell types
+        if CELLS in module_spec.keys():
+            build_cells(self, module_spec[CELLS], cell_specs)
+        else:
             logging.warning(f"*** Warning: No cells in model: {self.key}")
-        # create spines to connect axons and dendrites in each node
-        for node in self.nodes.values():
-            node.connect()
+        self.compile()
+
+    @cached_property
+    def key(self) -> str:
+        return f'md-{self.id:02d}'
 
-    def on_state_dump(self):
+    def components(self, items: str) -> dict:
+        """
+        the components of a kind (cells, dendrites, axons, spines or synapses) by key, built once for each compile of
+        the module; not to be modified
+        """
+        if items == CELLS:
+            return self.cells
+        if self.topology is None:
+            return self._components_by_key(items)
+        if self.keyed[0] is not self.topology:
+            self.keyed = (self.topology, {})
+        by_kind = self.keyed[1]
+        if items not in by_kind:
+            by_kind[items] = self._components_by_key(items)
+        return by_kind[items]
+
+    def _components_by_key(self, items: str) -> dict:
+        if items == DENDRITES:
+            return {dendrite.key: dendrite for dendrite in self.dendrites}
+        if items == AXONS:
+            return {axon.key: axon for axon in self.axons}
+        spines = [spine for dendrite in self.dendrites for spine in dendrite.spines]
+        if items == SPINES:
+            return {spine.key: spine for spine in spines}
+        return {spine.synapse.key: spine.synapse for spine in spines}
+
+    def on_state_dump(self, subscription=None):
+        """ :param subscription: the parts of the state to dump (see subscription.py), None for all of it """
+        if subscription is not None:
+            return {self.key: self._watched_state_dump(subscription)}
         return {
             self.key: {
                 DESCRIPTION: self.description,
@@ -82,87 +121,90 @@ class Module(AbsUpdatable):
                 SPINES: {spine.key: spine.on_state_dump() for dendrite in self.dendrites for spine in dendrite.spines},
                 SYNAPSES: {spine.synapse.key: spine.synapse.on_state_dump() for dendrite in self.dendrites for spine in dendrite.spines},
                 NODES: {key: node.on_state_dump() for key, node in self.nodes.items()},
+                NODE_POTENTIAL: self.node_potential.copy(),
             }
         }
 
+    def _watched_state_dump(self, subscription) -> dict:
+        """ the state dump of the components watched by a subscription, and of its node potentials if watched """
+        state = {
+            DESCRIPTION: self.description,
+            DIMENSIONS: self.dimensions,
+            BIAS: self.bias,
+            NODES: {},
+        }
+        for items in [CELLS, AXONS, DENDRITES, SPINES, SYNAPSES]:
+            keys = subscription.keys(self.key, items)
+            if keys is None:
+                state[items] = {key: item.on_state_dump() for key, item in self.components(items).items()}
+            elif keys:
+                components = self.components(items)
+                state[items] = {key: components[key].on_state_dump() for key in keys if key in components}
+            else:
+                state[items] = {}
+        if self.key in subscription.grids:
+            state[NODE_POTENTIAL] = self.node_potential.copy()
+        return state
+
+    def compile(self):
+        """
+        Compile the module's connectivity into its evaluation schedule and index arrays (see topology.py)
+        and, with array_engine set, move component state into arrays.
+        """
+        self.topology = Topology(self)
+        if self.array_engine:
+            self.engine = Engine(self, self.replicas)
+
+    def wake(self):
+        """ wake every spine, eg after their state or their inputs have been changed from outside the tick """
+        if self.engine is not None:
+            self.engine.wake()
+        for dendrite in self.dendrites:
+            dendrite.awake = set(dendrite.spines)
+
+    def connectivity_changed(self):
+        """ invalidate the compiled topology; it is recompiled before the next tick """
+        self.topology = None
+
     def on_content_request(self):
         return [str(self.key)] + [
             node.on_content_request() for node in self.nodes.values() if len(node.on_content_request()) > 1
         ]
 
-    def make_cells(self, cell_type, cell_spec, cell_specs):
-        for location in cell_spec[LOCATIONS]:
-            cell = Cell(self, location, cell_specs[cell_type])
-            self.cells[cell.key] = cell
-            self.nodes[location].cells[cell.key] = cell
-            # reference dendrites from the nodes that they cross
-            self.add_dendrites_to_nodes(cell)
-            # reference axons from the nodes that they cross
-            self.add_axons_to_nodes(cell)
-
-    def add_axons_to_nodes(self, cell):
-        for axon in cell.axons:
-            self.axons.append(axon)
-            for loc in axon.locations:
-                self.nodes[loc].axons.append(axon)
-
-    def add_dendrites_to_nodes(self, cell):
-        for dendrite in cell.dendrites:
-            self.dendrites.append(dendrite)
-            for spine in dendrite.spines:
-                self.spines.append(spine)
-            for location in dendrite.locations:
-                self.nodes[location].dendrites.append(dendrite)
-
     def on_tick(self):
-        cell_set = set([])
-        cells_done = set([])
-        cell_next_set = set([])
-        # starting with sensors, activate cell network in breadth-first order
-        for cell in self.cells.values():
-            if cell.cell_type == SENSOR:
-                cell_set.add(cell)
-        while len(cell_set) > 0:
-            # update this layer
-            for cell in cell_set:
-                # avoid infinite loop if cells feedback into network
-                # feedback is incorporated in next pass through the network
-                if cell not in cells_done:
-                    cell.on_tick()
-                    cells_done.add(cell)
-                # add child cells to next_set
-                for child in cell.children:
-                    cell_next_set.add(child)
-            # set up for next layer
-            cell_set = cell_next_set
-            cell_next_set = set([])
+        # recompile if the connectivity has changed since the last tick
+        if self.topology is None:
+            self.compile()
+        if self.bias != self.tick_bias:
+            self.tick_bias = self.bias
+            if self.event_driven:
+                self.wake()
+        # starting with sensors, activate the cell network layer by layer, in the precomputed order
+        if self.engine is None:
+            for cell in self.topology.schedule:
+                cell.on_tick()
+        else:
+            self.engine.on_tick()
+        # create the latent spines of axons that have become active, and evict dormant spines over budget
+        if self.latent is not None and self.latent.on_tick():
+            self.compile()
         # update nodes
         self.nodes_on_tick()
 
+    def settled_ticks(self, limit: int) -> int:
+        """ number of ticks, up to limit, that fast_forward() can advance (0 without the array engine) """
+        if self.engine is None or self.topology is None or self.bias != self.tick_bias:
+            return 0
+        return self.engine.settled_ticks(limit)
+
+    def fast_forward(self, ticks: int):
+        """ advance a settled stretch of ticks in closed form (see Engine.fast_forward()) """
+        self.engine.fast_forward(ticks)
+        self.nodes_on_tick()
+
     def nodes_on_tick(self):
-        dims = len(self.dimensions)
-        if dims == 2:
-            for row in range(self.dimensions[0]):
-                for col in range(self.dimensions[1]):
-                    self.nodes[(row, col)].on_tick()
-        elif dims == 3:
-            for row in range(self.dimensions[0]):
-                for col in range(self.dimensions[1]):
-                    for layer in range(self.dimensions[2]):
-                        self.nodes[(row, col, layer)].on_tick()
-        else:
-            raise ValueError("%s dimensions provided. Only 2 and 3 dimensions are supported." % dims)
-
-    def _create_nodes(self):
-        dims = len(self.dimensions)
-        if dims == 2:
-            self.nodes = {(i, j): Node((i, j), self)
-                          for j in range(self.dimensions[1])
-                          for i in range(self.dimensions[0])}
-        elif dims == 3:
-            self.nodes = {(i, j, k): Node((i, j, k), self)
-                          for k in range(self.dimensions[2])
-                          for j in range(self.dimensions[1])
-                          for i in range(self.dimensions[0])}
-        else:
-            raise ValueError("%s dimensions provided. Only 2 and 3 dimensions are supported." % dims)
+        if self.engine is not None:
+            self.engine.nodes_on_tick()
+            return
+        for node in self.nodes.values():
+            node.on_tick()
@@ -30,6 +30,8 @@ from model_spec import DPS
 
 from plotter import Plotter
 from translator import DataTranslator
+from transport import StateReader
+from subscription import Subscription
 from constants import NS_PER_MS
 
 
@@ -50,11 +52,15 @@ class Monitor:
         self.data_batch = 0
         self.plot_time = 0
         self.model_data = None
+        self.reader = StateReader()     # the actor's state, published in shared memory (see transport.py)
+        self.translator = None          # the plot request, compiled with the first state
         self.plotter = None
         self.monitoring = True
         self.started = False
         self.logged_plot_data = False
         self.paused = False
+        # ask the actor for only the parts of its state that the plots watch, before its first frame
+        self.pipe.send(Subscription(required_plots))
 
     def start(self):
         logging.info("*** Starting monitor...")
@@ -67,12 +73,16 @@ class Monitor:
                 # draw flushes ui events ensuring key press events are handled
                 self.plotter.draw()
                 continue
-            if self.pipe.poll():  # true when data available
+            if self.pipe.poll():  # true when a handshake is available
                 self.process_data()
+            model_state = self.reader.read()
+            if model_state is not None:  # a new frame
+                self.process_model_data(model_state)
 
     def _end_app(self, event):
         # stop actor's process
         self.pipe.send('die')
+        self.reader.close()
         if self.profiling:
             time.sleep(0.2)
             # stop profiling
@@ -90,8 +100,7 @@ class Monitor:
             self.plotter.show_state(self.paused)
 
     def process_data(self):
-        model_state = self.pipe.recv()
-        self.process_model_data(model_state)
+        self.reader.on_handshake(self.pipe.recv())
 
     def process_model_data(self, model_state: {}):
         self.data_batch += 1
@@ -111,8 +120,12 @@ class Monitor:
             self.logged_plot_data = True
 
     def translate_data(self, model_state):
-        translator = DataTranslator(self.required_plots, model_state)
-        return translator.figure_data, translator.plot_data
+        if self.translator is None:
+            # compile the plot request, once
+            self.translator = DataTranslator(self.required_plots, model_state)
+        else:
+            self.translator.translate(model_state)
+        return self.translator.figure_data, self.translator.plot_data
 
     def plot_it(self, figure_data, plot_data):
         if self.plotter is None:
@@ -20,22 +20,18 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
-from abs_events import AbsUpdatable
-from spine import Spine
-import itertools
+import numpy as np
 
+from abs_events import AbsUpdatable
 from model_spec import UserFunctions, REST_POTENTIAL
 from constants import *
 
 
 class Node(AbsUpdatable):
 
-    count = 0
-    _counter = itertools.count(1)
-
     def __init__(self, location, module):
-        # keep count of created objects
-        Node.count = next(self._counter)
+        # id, unique among the nodes of the brain
+        self.id = module.brain.ids.next(NODE)
         # a node belongs to:
         self.module = module
         # a node has:
@@ -47,6 +43,15 @@ class Node(AbsUpdatable):
         self.dendrites = []
         self.spines = []
 
+    @property
+    def potential(self) -> float:
+        # held in the module's dense grid of node potentials
+        return float(self.module.node_potential[self.location])
+
+    @potential.setter
+    def potential(self, value: float):
+        self.module.node_potential[self.location] = value
+
     def on_state_dump(self):
         return {
             LOCATION: self.location,
@@ -71,21 +76,63 @@ class Node(AbsUpdatable):
     def on_tick(self):
         self.potential = UserFunctions.update_node(self.cells, self.dendrites, self.spines)
 
-    def connect(self):
-        # at this node, each dendrite can connect to each axon via a connecting spine
-        for dendrite in self.dendrites:
-            for axon in self.axons:
-                # skip connections between axons and dendrites from the same soma (gives uncontrolled feedback)
-                if dendrite.parent == axon.parent:
-                    continue
-                spine = Spine(self.module, self.location, dendrite, axon)
-                self.spines.append(spine)
-                dendrite.spines.append(spine)
-                # connect axon parent cell (parent) to dendrite parent cell (child)
-                axon.parent.children.add(dendrite.parent)
-
     def __repr__(self):
         return "C:" + str(self.location)\
                + " A:" + str(self.axons) \
                + " D:" + str(self.dendrites) \
                + " s:" + str(self.spines)
+
+
+class NodeGrid:
+    """
+    NodeGrid holds the nodes of a module on its grid: which locations are occupied (hold a cell, axon, dendrite or
+    spine) as an array of the module's dimensions, and a Node object for each occupied location only, created when
+    the location is first asked for. The node potentials are the module's grid node_potential, and those of
+    unoccupied nodes stay at REST_POTENTIAL.
+
+    It is read like the dictionary of nodes by location tuple that it replaces: nodes[location] gives the node at a
+    location (creating it, and occupying the location), and keys(), values() and items() go through the occupied
+    nodes in node order, the last dimension varying slowest.
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.dimensions = tuple(module.dimensions)
+        if len(self.dimensions) not in (2, 3):
+            raise ValueError("%s dimensions provided. Only 2 and 3 dimensions are supported." % len(self.dimensions))
+        self.occupied = np.zeros(self.dimensions, dtype=bool)
+        self._nodes = {}        # Node objects by location
+        self._ordered = None    # occupied locations in node order, until a node is created
+
+    def __getitem__(self, location: tuple) -> Node:
+        node = self._nodes.get(location)
+        if node is None:
+            if len(location) != len(self.dimensions) or \
+                    not all(0 <= index < size for index, size in zip(location, self.dimensions)):
+                raise KeyError(location)
+            node = self._nodes[location] = Node(location, self.module)
+            self.occupied[location] = True
+            self._ordered = None
+        return node
+
+    def __contains__(self, location: tuple) -> bool:
+        return location in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self) -> list:
+        if self._ordered is None:
+            transposed = self.occupied.T
+            flat = np.flatnonzero(transposed)
+            self._ordered = list(zip(*(index.tolist() for index in np.unravel_index(flat, transposed.shape)[::-1])))
+        return self._ordered
+
+    def values(self) -> list:
+        return [self._nodes[location] for location in self.keys()]
+
+    def items(self) -> list:
+        return [(location, self._nodes[location]) for location in self.keys()]
@@ -20,6 +20,7 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
+import numpy as np
 import matplotlib
 import matplotlib .pyplot as plt
 import matplotlib.style
@@ -27,7 +28,7 @@ from mpl_toolkits.axes_grid1 import make_axes_locatable
 
 from abs_plotter import AbsPlotter
 from constants import *
-from model_spec import UPS, DPS
+from model_spec import UPS, DPS, SCROLLBACK, BLIT
 from utils import contrast_to, my_xkcd
 
 
@@ -96,7 +97,13 @@ class Plotter(AbsPlotter):
 
                 The line data is initialised to the default (y-base) value over x-range.
                 The first real value is appended.
-                The line and its x-axis scrolls to the left as new data is added at the right.
+                The line scrolls to the left as new data is added at the right. The x-axis stays put: it shows the
+                time of each point before the latest, so that the axes need not be redrawn (see Plotter.refresh()).
+
+                The points are held in a ring buffer of a fixed number of points: those of the x-range and of
+                SCROLLBACK seconds before it. Each point is stored twice, one ring apart, so that the points in order
+                are always a contiguous slice of the buffer, and adding a point takes the same time however long
+                the line has run.
                 """
 
                 def __init__(self, subplot: any, key: str, value: float, x_range: tuple, y_base: float):
@@ -113,11 +120,19 @@ class Plotter(AbsPlotter):
                     self.key = key
                     start = x_range[0] * DPS
                     end = x_range[1] * DPS
-                    # set x, y values to x_range and y_base respectively
-                    self.x = [float(x / DPS) for x in range(start, end)]
-                    self.y = [y_base for _ in range(start, end)]
-                    self.y[-1] = value
-                    self.line_object = subplot.plot(self.x, self.y, label=key)[0]  # plot-library specific call
+                    # points in the ring: the x-range and the scrollback
+                    self.size = end - start + SCROLLBACK * DPS
+                    # set x, y values to x_range (and the scrollback before it) and y_base respectively
+                    self.x = np.arange(end - self.size, end) / DPS
+                    self.y = np.full(2 * self.size, y_base, dtype=float)
+                    self.y[[self.size - 1, 2 * self.size - 1]] = np.nan if value is None else value
+                    self.first = 0  # position in the ring of the oldest point
+                    self.line_object = subplot.plot(*self._points(), label=key)[0]  # plot-library specific call
+                    self.line_object.set_animated(True)
+
+                def _points(self) -> tuple:
+                    """ the x and y values of the points, oldest first (y: a view of the ring buffer) """
+                    return self.x, self.y[self.first:self.first + self.size]
 
                 def plot(self, value: float):
                     """
@@ -126,10 +141,10 @@ class Plotter(AbsPlotter):
                     :param value: new y-value
                     :return: None
                     """
-                    self.x.append(self.x[-1] + 1)
-                    self.y.append(value)
-                    self.line_object.set_xdata(self.x)
-                    self.line_object.set_ydata(self.y)
+                    # the new point replaces the oldest, at both of its positions in the buffer
+                    self.y[[self.first, self.first + self.size]] = np.nan if value is None else value
+                    self.first = (self.first + 1) % self.size
+                    self.line_object.set_data(*self._points())
 
             def __init__(self, subplot: any, plot_request: dict):
                 """
@@ -144,6 +159,7 @@ class Plotter(AbsPlotter):
                     self.line_dict[key] = self.Line(subplot, key, value,
                                                     plot_request[X_RANGE], plot_request[Y_BASE])
                 self._legend(subplot, plot_request[VARIABLE])
+                self.changed = True
 
             def plot(self, plot_request: dict):
                 """
@@ -152,10 +168,13 @@ class Plotter(AbsPlotter):
                 :param plot_request: dictionary specifying one-or-more lines to be updated with the included values.
                 :return: None
                 """
-                x_lim = self.subplot.get_xlim()
                 for key, value in plot_request[Y_DATA].items():
                     self.line_dict[key].plot(value)
-                self.subplot.set_xlim(tuple(map(lambda x: x + 1 / DPS, x_lim)))
+                self.changed = True
+
+            def artists(self) -> list:
+                """ :return: the artists that change as the lines are updated, in the order to draw them """
+                return [line.line_object for line in self.line_dict.values()]
 
             def _legend(self, subplot, title: str = None):
                 """
@@ -165,13 +184,16 @@ class Plotter(AbsPlotter):
                 :param title: Title for the legend (defaults to None).
                 :return:
                 """
-                subplot.legend(loc='upper left', title=title)
+                # opaque, to be restored over the lines as it was drawn (see Plotter.refresh())
+                subplot.legend(loc='upper left', title=title, framealpha=1.0)
 
         class CellMap(AbsPlotter.AbsSubPlot.AbsCellMap):
             """
             CellMap creates a 2D map of the cells, axons and dendrites of a single module.
 
             Active elements of the model are highlighted by setting alpha = 1.0
+            The cells, axons and dendrites (and the cell labels, drawn over them) are redrawn only when one of them
+            has changed (see changed).
             """
 
             def __init__(self, subplot: any, plot_request: dict):
@@ -186,6 +208,7 @@ class Plotter(AbsPlotter):
                 self.patch_dict = {}
                 # active state (True = active) of cells and cell components
                 self.active_dict = {}
+                self.labels = []
                 self.subplot = subplot
                 for key, cell in plot_request[CELLS].items():
                     self.patch_dict[key] = self._plot_cell(cell, subplot)
@@ -197,6 +220,9 @@ class Plotter(AbsPlotter):
                     self.patch_dict[key] = self._plot_item(axon, subplot, AXONS)
                     self.active_dict[key] = axon[ACTIVE]
                 self._cell_map_legend(subplot)
+                for artist in self.artists():
+                    artist.set_animated(True)
+                self.changed = True
 
             def plot(self, plot_request: dict):
                 """
@@ -210,14 +236,21 @@ class Plotter(AbsPlotter):
                     if self.active_dict[key] != cell[ACTIVE]:
                         self.active_dict[key] = cell[ACTIVE]
                         self.patch_dict[key].set_alpha(alphas[cell[ACTIVE]])
+                        self.changed = True
                 for key, dendrite in plot_request[DENDRITES].items():
                     if self.active_dict[key] != dendrite[ACTIVE]:
                         self.active_dict[key] = dendrite[ACTIVE]
                         self.patch_dict[key].set_alpha(alphas[dendrite[ACTIVE]])
+                        self.changed = True
                 for key, axon in plot_request[AXONS].items():
                     if self.active_dict[key] != axon[ACTIVE]:
                         self.active_dict[key] = axon[ACTIVE]
                         self.patch_dict[key].set_alpha(alphas[axon[ACTIVE]])
+                        self.changed = True
+
+            def artists(self) -> list:
+                """ :return: the artists that change as the cell map is updated, in the order to draw them """
+                return sorted(self.patch_dict.values(), key=lambda patch: patch.get_zorder()) + self.labels
 
             def _plot_item(self, item_spec: dict, subplot: any, item_type: str):
                 """
@@ -251,8 +284,8 @@ class Plotter(AbsPlotter):
                     patch = plt.Circle(location, label=cell_spec[KEY], zorder=0.5, radius=SOMA_RADIUS,
                                        fc=CELL_MAP_COLOR[cell_type], alpha=0.5)
                 subplot.add_patch(patch)
-                subplot.text(location[0], location[1], str(cell_spec[KEY])[-2:], va='center', ha='center',
-                             color=contrast_to(CELL_MAP_COLOR[cell_type]))
+                self.labels.append(subplot.text(location[0], location[1], str(cell_spec[KEY])[-2:], va='center',
+                                                ha='center', color=contrast_to(CELL_MAP_COLOR[cell_type])))
                 return patch
 
             def _cell_map_legend(self, subplot: any, title: str = None):
@@ -277,7 +310,8 @@ class Plotter(AbsPlotter):
                                        plt.Line2D([0], [0], marker='o', color='black',
                                                   markerfacecolor=CELL_MAP_COLOR['sensor'],
                                                   markersize=12, label='Sensors', alpha=0.7)]
-                subplot.legend(handles=legend_elements, title=title, loc='upper left')
+                # opaque, to be restored over the cells as it was drawn (see Plotter.refresh())
+                subplot.legend(handles=legend_elements, title=title, loc='upper left', framealpha=1.0)
 
         class HeatMap(AbsPlotter.AbsSubPlot.AbsHeatMap):
             """
@@ -306,7 +340,9 @@ class Plotter(AbsPlotter):
                     vmax=plot_request[V_MAX],
                     interpolation='gaussian')
                 self.image.set_cmap('jet')
-                plt.colorbar(self.image, cax=cax)
+                subplot.figure.colorbar(self.image, cax=cax)
+                self.image.set_animated(True)
+                self.changed = True
 
             def plot(self, plot_request: dict):
                 """
@@ -316,6 +352,11 @@ class Plotter(AbsPlotter):
                 :return: None
                 """
                 self.image.set_data(plot_request[XY_DATA])
+                self.changed = True
+
+            def artists(self) -> list:
+                """ :return: the artists that change as the heatmap is updated """
+                return [self.image]
 
         def __init__(self, subplot):
             """
@@ -326,6 +367,21 @@ class Plotter(AbsPlotter):
             self.subplot = subplot
             self.plot_object = None
 
+        def changed(self) -> bool:
+            """ :return: True if the subplot has changed since it was last drawn (see draw_artists()) """
+            return self.plot_object is not None and self.plot_object.changed
+
+        def draw_artists(self):
+            """
+            Draw the artists of this subplot that change, over the rest of it (see Plotter.refresh()).
+
+            :return: None
+            """
+            if self.plot_object is not None:
+                for artist in self.plot_object.artists():
+                    self.subplot.draw_artist(artist)  # plot-library specific code
+                self.plot_object.changed = False
+
         def plot(self, plot_request):
             """
             Dispatch a plot_request to the relevant specialised class.
@@ -366,11 +422,18 @@ class Plotter(AbsPlotter):
         self.figure_spec = figure_spec
         self.subplots = None  # dict with key: subplot tuple; value: subplot object
         self.canvas = None
+        self.backgrounds = None  # dict with key: subplot tuple; value: the subplot as last drawn in full, less artists
+        self.foregrounds = None  # dict with key: subplot tuple; value: its legend as last drawn in full, or None
         self._set_plot_config()
         self.canvas, self.plot_object, self.subplots = self._make_plot(end_app_func, pause_func, figure_spec)
         self._set_subplot_configs(plot_requests)
         self.data_batch = 0
+        # === start plot-library specific code
+        self.blit = BLIT and self.canvas.supports_blit
+        self.canvas.mpl_connect('draw_event', self._on_draw)
         plt.ion()
+        plt.show(block=False)
+        # === end plot-library specific code
 
     def _set_plot_config(self):
         """
@@ -454,6 +517,65 @@ class Plotter(AbsPlotter):
             self.plot_object.suptitle(self.figure_spec[TITLE] + ' (press enter to unpause)', fontsize=16)
         else:
             self.plot_object.suptitle(self.figure_spec[TITLE] + '   (press enter to pause)  ', fontsize=16)
+        # the title is not redrawn by refresh()
+        self.canvas.draw_idle()  # plot-library specific code
+
+    def _on_draw(self, event: any):
+        """
+        Keep the background of each subplot, as drawn in full without its changing artists, and its legend (opaque,
+        to go over them), and draw the artists and legend over the background.
+        Called by the plot library after each full draw of the figure, eg when first shown or resized.
+
+        :param event: plot-library specific draw event
+        :return: None
+        """
+        # === start plot-library specific code
+        if not self.canvas.supports_blit:
+            for subplot in self.subplots.values():
+                subplot.draw_artists()
+            return
+        self.backgrounds = {}
+        self.foregrounds = {}
+        for key, subplot in self.subplots.items():
+            legend = subplot.subplot.get_legend()
+            self.backgrounds[key] = self.canvas.copy_from_bbox(subplot.subplot.bbox)
+            self.foregrounds[key] = None if legend is None else self.canvas.copy_from_bbox(legend.get_window_extent())
+            self._draw_artists(key)
+        # === end plot-library specific code
+
+    def _draw_artists(self, key: tuple):
+        """
+        Draw the changing artists of a subplot over it, then its legend over them.
+
+        :param key: subplot tuple
+        :return: None
+        """
+        self.subplots[key].draw_artists()
+        # === start plot-library specific code
+        if self.foregrounds[key] is not None:
+            self.canvas.restore_region(self.foregrounds[key])
+        # === end plot-library specific code
+
+    def refresh(self):
+        """
+        Redraw the subplots that have changed: restore each one's background and draw only its changing artists
+        (lines, heatmap image, cell-map patches) and legend over it, then blit it to the screen.
+        Much quicker than draw(), which redraws the whole figure: axes, text, legends, colorbars and all.
+
+        :return: None
+        """
+        # === start plot-library specific code
+        if self.backgrounds is None:
+            # not drawn in full yet
+            self.canvas.draw()
+        else:
+            for key, subplot in self.subplots.items():
+                if subplot.changed():
+                    self.canvas.restore_region(self.backgrounds[key])
+                    self._draw_artists(key)
+                    self.canvas.blit(subplot.subplot.bbox)
+        self.canvas.flush_events()
+        # === end plot-library specific code
 
     def draw(self):
         """
@@ -473,8 +595,15 @@ class Plotter(AbsPlotter):
         :param plot_requests: list of plot request dictionaries (see Plotter() class doc).
         :return: None
         """
+        created = any(self.subplots[request[SUBPLOT]].plot_object is None for request in plot_requests)
         for request in plot_requests:
             self.subplots[request[SUBPLOT]].plot(request)
         self.data_batch += 1
-        if self.data_batch % DPS == 0:
+        if self.blit:
+            if created:
+                # new legends, colorbars etc: the backgrounds must be drawn again, in full
+                self.backgrounds = None
+            # quick enough to refresh with every batch
+            self.refresh()
+        elif self.data_batch % DPS == 0:
             self.draw()
@@ -0,0 +1,175 @@
+"""
+    Program: ALBERT
+    Module: recorder.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import json
+import logging
+
+import numpy as np
+
+from constants import *
+
+TICK = 'tick'
+# the variables that can be traced, by kind of item, and the name of each kind in the engine's arrays (see Engine)
+VARIABLES = {
+    CELLS: (CELL, [POTENTIAL, ACTIVE, INJECTED_POTENTIAL]),
+    DENDRITES: (DENDRITE, [POTENTIAL]),
+    AXONS: (AXON, [ACTIVE]),
+    SPINES: (SPINE, [LENGTH, CONNECTED, POTENTIAL]),
+    SYNAPSES: (SYNAPSE, [STRENGTH, POTENTIAL]),
+    NODES: (NODE, [POTENTIAL]),
+}
+
+
+def read_trace(path: str):
+    """
+    Open a trace file, eg while it is being recorded, without copying it.
+
+    :return: the trace, a read-only memory mapped array (ticks, columns), and the names of its columns
+    """
+    with open(f'{path}.json') as file:
+        header = json.load(file)
+    return np.load(path, mmap_mode='r'), header['columns']
+
+
+def in_order(trace: np.ndarray) -> np.ndarray:
+    """ the rows of a trace that have been written, in order of tick (a copy) """
+    rows = np.flatnonzero(trace[:, 0] >= 0)
+    return np.asarray(trace[rows[np.argsort(trace[rows, 0], kind='stable')]])
+
+
+class Selection:
+    """ a variable of some items of a module, recorded in consecutive columns of the trace """
+
+    def __init__(self, module, request: dict, first: int):
+        self.module = module
+        self.items = request[ITEMS]
+        if self.items not in VARIABLES:
+            raise ValueError(f"cannot trace {self.items}: not one of {list(VARIABLES)}")
+        self.kind, variables = VARIABLES[self.items]
+        self.variable = request[VARIABLE]
+        if self.variable not in variables:
+            raise ValueError(f"cannot trace {self.variable} of {self.items}: not one of {variables}")
+        known = self._known()
+        self.keys = [tuple(key) if self.items == NODES else key for key in request.get(ITEM_KEYS) or known]
+        known = set(known)
+        unknown = [key for key in self.keys if key not in known]
+        if unknown:
+            raise ValueError(f"no {self.items} {unknown} in module {module.key}")
+        self.columns = slice(first, first + len(self.keys))
+        self.compiled = None    # the topology and engine of the module that the sources were resolved for
+        self.present = None     # columns (from the first of the selection) of the items that exist
+        self.absent = None      # and of those that do not (latent spines)
+        self.index = None       # the items that exist: their indices in the engine's array, or the objects
+
+    def _known(self) -> list:
+        """ keys (locations for nodes) of every item that there is or may be in the module, in order """
+        module = self.module
+        if self.items == NODES:
+            return list(np.ndindex(*module.dimensions))
+        keys = list(self.module.components(self.items))
+        if self.items in (SPINES, SYNAPSES) and module.latent is not None:
+            # spines not created yet, or evicted, and their synapses (keyed as Spine.key and Synapse.key)
+            ids = module.latent.spine_id if self.items == SPINES else module.latent.synapse_id
+            keys += [f'{"sp" if self.items == SPINES else "sy"}-{item_id:02d}' for item_id in ids.tolist()]
+        return keys
+
+    def _resolve(self):
+        """ find the items, and their places in the engine's arrays, once for each compile of the module """
+        module = self.module
+        self.compiled = (module.topology, module.engine)
+        if self.items == NODES:
+            self.present = np.arange(len(self.keys))
+            self.absent = np.zeros(0, dtype=np.intp)
+            self.index = np.ravel_multi_index(tuple(np.array(self.keys).T), module.dimensions)
+            return
+        objects = self.module.components(self.items)
+        found = [objects.get(key) for key in self.keys]
+        self.present = np.array([column for column, item in enumerate(found) if item is not None], dtype=np.intp)
+        self.absent = np.array([column for column, item in enumerate(found) if item is None], dtype=np.intp)
+        items = [item for item in found if item is not None]
+        self.index = np.array([item.index for item in items], dtype=np.intp) if module.engine is not None else items
+
+    def values(self) -> tuple:
+        """ :return: columns (from the first of the selection) and values of the items that exist """
+        module = self.module
+        if self.compiled != (module.topology, module.engine):
+            self._resolve()
+        if self.items == NODES:
+            return self.present, module.node_potential.reshape(-1)[self.index]
+        engine = module.engine
+        if engine is not None:
+            target = engine if engine.replica is None else engine.replica
+            return self.present, getattr(target, f'{self.kind}_{self.variable}')[self.index]
+        return self.present, [getattr(item, self.variable) for item in self.index]
+
+
+class Recorder:
+    """
+    Recorder records selected variables of a brain (see trace_request in model_spec.py) on every tick into a trace
+    file: a NumPy .npy file of rows (ticks) x columns of floats, preallocated and memory mapped, which holds the
+    last so many ticks as a ring. The first column is the tick (time alive at its start), -1 until the row is first
+    written, and set once the rest of the row has been; the other columns are named, eg 'md-01/sp-05/length',
+    in a small JSON header alongside (the file name + '.json').
+
+    Another process can read the trace as it is recorded, without copying it (see read_trace()). Booleans are
+    recorded as 0 or 1. A spine that has not been created (LAZY_SPINES) or has been evicted reads as NaN.
+    """
+
+    def __init__(self, brain, requests: list, path: str, ticks: int):
+        """
+        :param requests: the variables to record: dictionaries of 'module' (key), 'items' (cells, dendrites, axons,
+                         spines, synapses or nodes), 'variable' and 'item-keys' (node locations for nodes);
+                         without item-keys, every item of the module
+        :param ticks: rows of the trace, ie the ticks of the ring
+        """
+        self.path = path
+        modules = {module.key: module for module in brain.modules}
+        self.selections = []
+        columns = [TICK]
+        for request in requests:
+            if request[MODULE] not in modules:
+                raise ValueError(f"cannot trace module {request[MODULE]}: no such module")
+            selection = Selection(modules[request[MODULE]], request, len(columns))
+            self.selections.append(selection)
+            columns += [f'{request[MODULE]}/{key}/{selection.variable}' if selection.items != NODES else
+                        f'{request[MODULE]}/{",".join(map(str, key))}/{selection.variable}' for key in selection.keys]
+        self.columns = columns
+        self.trace = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(ticks, len(columns)))
+        self.trace[:, 0] = -1
+        with open(f'{path}.json', 'w') as file:
+            json.dump({'columns': columns, 'rows': ticks}, file)
+        logging.info(f"tracing {len(columns) - 1} variables into {path}, the last {ticks} ticks")
+
+    def on_tick(self, tick: int):
+        """ record the selected variables after a tick, in the row of the ring for the tick """
+        row = self.trace[tick % len(self.trace)]
+        row[0] = -1
+        for selection in self.selections:
+            columns = row[selection.columns]
+            present, values = selection.values()
+            columns[present] = values
+            if len(selection.absent):
+                columns[selection.absent] = np.nan
+        row[0] = tick
+
+    def close(self):
+        self.trace.flush()
@@ -0,0 +1,49 @@
+"""
+    Program: ALBERT
+    Module: registry.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import numpy as np
+
+
+class IdRegistry:
+    """
+    IdRegistry allocates the integer ids of the components of one brain, numbered from 1 for each kind of component
+    (cell, axon, dendrite, spine, synapse, node, module, bridge). Components format their keys (eg 'sp-12') from
+    their ids on demand, so every brain numbers its components alike, however many brains the process builds.
+    """
+
+    def __init__(self):
+        self._last = {}     # last id allocated, by kind of component
+
+    def next(self, kind: str) -> int:
+        """ the next id of a kind of component """
+        self._last[kind] = self._last.get(kind, 0) + 1
+        return self._last[kind]
+
+    def allocate(self, kind: str, count: int) -> np.ndarray:
+        """ the next count ids of a kind of component, as next() would return them one by one """
+        first = self._last.get(kind, 0) + 1
+        self._last[kind] = first + count - 1
+        return np.arange(first, first + count, dtype=np.int64)
+
+    def count(self, kind: str) -> int:
+        """ the number of ids allocated to a kind of component """
+        return self._last.get(kind, 0)
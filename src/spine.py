@@ -20,7 +20,7 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
-import itertools
+from functools import cached_property
 from abs_events import AbsUpdatable
 from constants import *
 from synapse import Synapse
@@ -40,14 +40,14 @@ class Spine(AbsUpdatable):
     Limitations: A feeder axon is either excitatory or inhibitory, therefore individual spines
                  build either an excitatory or inhibitory potential, but not a mix.
     """
-    spine_count = 0
-    _spine_counter = itertools.count(1)
 
-    def __init__(self, module, location: tuple, dendrite, axon):
-        # keep count of created objects
-        Spine.spine_count = next(self._spine_counter)
+    def __init__(self, module, location: tuple, dendrite, axon, spine_id: int = None, synapse_id: int = None):
+        """
+        :param spine_id, synapse_id: ids allocated in advance (see LatentSpines), None: the next in the brain
+        """
+        # id, unique among the spines of the brain
+        self.id = module.brain.ids.next(SPINE) if spine_id is None else spine_id
         # spine has:
-        self.key = f'sp-{Spine.spine_count:02d}'
         self.module = module
         self.location = location
         self.dendrite = dendrite  # parent dendrite for this spine
@@ -57,7 +57,11 @@ class Spine(AbsUpdatable):
         self.potential = REST_POTENTIAL  # log(synapse.strength) if length > THRESHOLD else 0
         self.connected = False  # connected to axon?
         self.synapse = Synapse(self.module, self.location, self, self.axon,
-                               1 if self.axon.exciter else -1)  # only one synapse per spine
+                               1 if self.axon.exciter else -1, synapse_id)  # only one synapse per spine
+
+    @cached_property
+    def key(self) -> str:
+        return f'sp-{self.id:02d}'
 
     def on_state_dump(self):
         return {
@@ -79,6 +83,15 @@ class Spine(AbsUpdatable):
         self.length, self.connected, self.potential = \
             UserFunctions.update_spine(self.axon, self.synapse, self.length, self.connected, self.potential)
 
+    def on_tick_settled(self) -> bool:
+        """
+        on_tick(), for the event driven mode
+        :return: True if the update left the spine and its synapse unchanged, ie they are at rest
+        """
+        before = (self.length, self.connected, self.potential, self.synapse.strength, self.synapse.potential)
+        self.on_tick()
+        return before == (self.length, self.connected, self.potential, self.synapse.strength, self.synapse.potential)
+
     def __repr__(self):
         return \
             f"\t\t Spine: {self.location}" + \
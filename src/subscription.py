@@ -0,0 +1,65 @@
+"""
+    Program: ALBERT
+    Module: subscription.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+from constants import *
+
+# the variables that a cell map shows: the activity of cells, dendrites (from their potential) and axons
+CELL_MAP_FIELDS = [(CELLS, ACTIVE), (DENDRITES, POTENTIAL), (AXONS, ACTIVE)]
+
+
+class Subscription:
+    """
+    Subscription holds the parts of the brain's state that the monitor's plots watch, compiled from a plot request
+    (see plot_request in model_spec.py). The monitor sends it to the actor, which then dumps (see
+    Brain.on_state_dump()) and publishes (see transport.py) only those: the node potentials of heatmaps, the
+    activity of the cells, dendrites and axons of cell maps, and the variable of the items of lines.
+    """
+
+    def __init__(self, plot_request: list):
+        self.fields = {}    # (module key, items, variable) -> keys of the items, or None for every item
+        self.grids = set()  # keys of the modules whose node potentials are watched
+        for request in plot_request:
+            if request[PLOT_TYPE] == HEATMAP:
+                self.grids.add(request[MODULE])
+            elif request[PLOT_TYPE] == CELL_MAP:
+                for items, variable in CELL_MAP_FIELDS:
+                    self._add(request[MODULE], items, variable, None)
+            elif request[PLOT_TYPE] == LINES:
+                self._add(request[MODULE], request[ITEMS], request[VARIABLE], request[ITEM_KEYS])
+
+    def _add(self, module_key: str, items: str, variable: str, keys: list):
+        field = (module_key, items, variable)
+        if keys is None or (field in self.fields and self.fields[field] is None):
+            self.fields[field] = None
+        else:
+            watched = self.fields.setdefault(field, [])
+            watched += [key for key in keys if key not in watched]
+
+    def keys(self, module_key: str, items: str):
+        """ :return: keys of the watched items of a kind in a module, [] for none, or None for every one """
+        keys = []
+        for (module, kind, _), field_keys in self.fields.items():
+            if module == module_key and kind == items:
+                if field_keys is None:
+                    return None
+                keys += [key for key in field_keys if key not in keys]
+        return keys
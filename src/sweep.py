@@ -0,0 +1,238 @@
+"""
+    Program: ALBERT
+    Module: sweep.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Parameter sweep: trains the brain in model_spec.py headless (see headless.py) for each point of a grid, or a random
+sample, of overrides of the constants in model_spec.py, in a pool of processes, and collects the results in a table
+(csv), eg:
+
+    python sweep.py --grid SPINE_GROWTH_RATE=1.04,1.06,1.08 --grid DV_INHIBIT=-30,-20,-10 --results sweep.csv
+    python sweep.py --random SYNAPSE_DECAY_RATE=0.95:0.999 --random CONNECT_LENGTH=0.5:0.95 --samples 50
+
+Points already in the results table are skipped, so an interrupted sweep resumes where it stopped.
+
+Constants derived from an overridden one in model_spec.py (eg BIAS_ON from DV_INHIBIT, and the training values
+built from BIAS_ON) are computed again from the overrides, unless they are overridden too.
+"""
+
+import argparse
+import ast
+import csv
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+
+import numpy as np
+
+import model_spec
+from model_spec import UPS, TRAINING_CYCLES, training_data
+
+# results table columns, after the point key and the overridden constants
+METRICS = ['accuracy', 'test_accuracy', 'motor_active', 'connected_spines', 'mean_strength', 'ticks_per_second']
+
+
+def derivations(names: set) -> list:
+    """
+    The top level assignments of model_spec.py that depend on the named constants, directly or through other
+    constants, other than those of the named constants themselves, in the order of the file.
+
+    :return: (name, compiled expression) pairs
+    """
+    with open(model_spec.__file__) as file:
+        tree = ast.parse(file.read(), model_spec.__file__)
+    changed, derived = set(names), []
+    for statement in tree.body:
+        if not isinstance(statement, ast.Assign) or len(statement.targets) != 1 or \
+                not isinstance(statement.targets[0], ast.Name) or statement.targets[0].id in names:
+            continue
+        if {node.id for node in ast.walk(statement.value) if isinstance(node, ast.Name)} & changed:
+            changed.add(statement.targets[0].id)
+            derived.append((statement.targets[0].id,
+                            compile(ast.Expression(statement.value), model_spec.__file__, 'eval')))
+    return derived
+
+
+def override(constants: dict):
+    """
+    Override constants of model_spec.py in this process, and compute the constants derived from them again (see
+    derivations()): in model_spec and in every module of the program that imported them by name.
+    """
+    for name in constants:
+        if not hasattr(model_spec, name):
+            raise ValueError(f"No constant {name} in model_spec.py")
+    values = dict(constants)
+    namespace = {**vars(model_spec), **constants}
+    for name, expression in derivations(set(constants)):
+        values[name] = namespace[name] = eval(expression, namespace)
+    source = os.path.dirname(os.path.abspath(__file__))
+    for name, value in values.items():
+        original = getattr(model_spec, name)
+        for module in list(sys.modules.values()):
+            path = getattr(module, '__file__', None) or ''
+            if os.path.dirname(os.path.abspath(path)) == source and getattr(module, name, None) is original:
+                setattr(module, name, value)
+
+
+def point_key(constants: dict) -> str:
+    """ key identifying a point of the sweep in the results table """
+    return json.dumps(constants, sort_keys=True)
+
+
+def grid_points(grid: dict) -> list:
+    """ every combination of the values listed for each constant """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[name] for name in names])]
+
+
+def random_points(ranges: dict, samples: int, seed: int) -> list:
+    """ samples drawn uniformly from the (low, high) range of each constant """
+    rng = random.Random(seed)
+    names = sorted(ranges)
+    return [{name: rng.uniform(*ranges[name]) for name in names} for _ in range(samples)]
+
+
+def run_point(arguments) -> dict:
+    """
+    Pool task: train a brain with the given overrides, scoring the motor cells at the end of each second
+    against the expected activity for the training values presented in that second.
+
+    :return: row of the results table
+    """
+    constants, seconds, options = arguments
+    logging.disable(logging.WARNING)
+    override(constants)
+    # imported after the overrides, so that nothing built from the constants escapes them
+    from headless import build, run
+    actor = build(options['array_engine'], options['event_driven'], options['fast_forward'], workers=0)
+    scores, test_scores, motor_active = [], [], []
+    ticks_per_second = []
+    for second in range(seconds):
+        ticks_per_second.append(run(actor, UPS)['ticks_per_second'])
+        for module in actor.brain.modules:
+            data = training_data.get(module.key, {})
+            if 'expected' not in data or module.key not in actor.trainer.presented_row:
+                continue
+            expected = data['expected'][actor.trainer.presented_row[module.key]]
+            active = [module.cells[key].active for key in data['motor_keys'] if key in module.cells]
+            score = np.mean([got == want for got, want in zip(active, expected)]) if active else np.nan
+            scores.append(score)
+            if actor.trainer.cycle >= TRAINING_CYCLES:
+                test_scores.append(score)
+            motor_active.extend(active)
+    spines = [spine for module in actor.brain.modules for spine in module.spines]
+    return {
+        'key': point_key(constants),
+        **constants,
+        'accuracy': float(np.nanmean(scores)) if scores else np.nan,
+        'test_accuracy': float(np.nanmean(test_scores)) if test_scores else np.nan,
+        'motor_active': float(np.mean(motor_active)) if motor_active else np.nan,
+        'connected_spines': sum(spine.connected for spine in spines),
+        'mean_strength': float(np.mean([spine.synapse.strength for spine in spines])) if spines else np.nan,
+        'ticks_per_second': float(np.mean(ticks_per_second)) if ticks_per_second else np.nan,
+    }
+
+
+def finished_keys(results: str) -> set:
+    """ keys of the points already in the results table """
+    if not os.path.exists(results):
+        return set()
+    with open(results, newline='') as file:
+        return {row['key'] for row in csv.DictReader(file)}
+
+
+def sweep(points: list, seconds: int, results: str, processes: int = None, **options) -> int:
+    """
+    Run the points not yet in the results table in a pool of processes, appending each row as it completes.
+
+    :param options: array_engine, event_driven, fast_forward (see headless.build())
+    :return: number of points run
+    """
+    done = finished_keys(results)
+    todo = [point for point in points if point_key(point) not in done]
+    logging.info(f"sweep: {len(points)} points, {len(points) - len(todo)} already in {results}")
+    if not todo:
+        return 0
+    names = sorted({name for point in points for name in point})
+    new_file = not os.path.exists(results)
+    # one task per process, so that the overrides (and the component numbering) of one point never reach another
+    context = multiprocessing.get_context('fork')
+    with open(results, 'a', newline='') as file, \
+            context.Pool(processes or os.cpu_count(), maxtasksperchild=1) as pool:
+        writer = csv.DictWriter(file, fieldnames=['key'] + names + METRICS, restval='')
+        if new_file:
+            writer.writeheader()
+        for count, row in enumerate(pool.imap_unordered(run_point, [(point, seconds, options) for point in todo]), 1):
+            writer.writerow(row)
+            file.flush()
+            logging.info(f"sweep: {count}/{len(todo)} {row}")
+    return len(todo)
+
+
+def parse_value(text: str):
+    return json.loads(text)
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    parser = argparse.ArgumentParser(description='ALBERT parameter sweep over model_spec.py constants')
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help='values of a constant; the sweep covers every combination')
+    parser.add_argument('--random', action='append', default=[], metavar='NAME=LOW:HIGH',
+                        help='range of a constant, sampled uniformly')
+    parser.add_argument('--samples', type=int, default=20, help='number of random points')
+    parser.add_argument('--seed', type=int, default=123456789)
+    parser.add_argument('--seconds', type=int, default=TRAINING_CYCLES + 20,
+                        help='seconds of training per point (scored as test after TRAINING_CYCLES)')
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--results', default='sweep.csv')
+    parser.add_argument('--array-engine', action=argparse.BooleanOptionalAction, default=model_spec.ARRAY_ENGINE)
+    parser.add_argument('--event-driven', action=argparse.BooleanOptionalAction, default=model_spec.EVENT_DRIVEN)
+    parser.add_argument('--fast-forward', action=argparse.BooleanOptionalAction, default=model_spec.FAST_FORWARD)
+    args = parser.parse_args()
+
+    if args.grid and args.random:
+        parser.error('use either --grid or --random')
+    if args.grid:
+        grid = {}
+        for item in args.grid:
+            name, values = item.split('=', 1)
+            grid[name] = [parse_value(value) for value in values.split(',')]
+        sweep_points = grid_points(grid)
+    elif args.random:
+        ranges = {}
+        for item in args.random:
+            name, bounds = item.split('=', 1)
+            ranges[name] = tuple(parse_value(value) for value in bounds.split(':'))
+        sweep_points = random_points(ranges, args.samples, args.seed)
+    else:
+        parser.error('give --grid or --random overrides')
+    for point in sweep_points:
+        for constant in point:
+            if not hasattr(model_spec, constant):
+                parser.error(f"no constant {constant} in model_spec.py")
+    sweep(sweep_points, args.seconds, args.results, args.processes, array_engine=args.array_engine or args.fast_forward,
+          event_driven=args.event_driven, fast_forward=args.fast_forward)
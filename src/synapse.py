@@ -20,8 +20,8 @@ __maintainer__ = "Ray Jackson"
 __email__ = ""
 __status__ = "Production"
 
+from functools import cached_property
 from abs_events import AbsUpdatable
-import itertools
 from constants import *
 from model_spec import UserFunctions, SYNAPSE_GROWTH_RATE, SYNAPSE_DECAY_RATE, MIN_STRENGTH, REST_POTENTIAL
 
@@ -32,14 +32,9 @@ class Synapse(AbsUpdatable):
     Spines and axons can connect where they occupy the same node of a module.
     Axon-Spine pairs may thus share several synapses.
     """
-    synapse_count = 0
-    _synapse_counter = itertools.count(1)
 
-    def __init__(self, module, location: tuple, spine, axon, excite: int):
-        # keep count of created objects
-        Synapse.synapse_count = next(self._synapse_counter)
-        #
-        self.key = f'sy-{Synapse.synapse_count:02d}'  # who ami I?
+    def __init__(self, module, location: tuple, spine, axon, excite: int, synapse_id: int = None):
+        self.id = module.brain.ids.next(SYNAPSE) if synapse_id is None else synapse_id  # who am I?
         self.module = module                # where am I? (roughly)
         self.location = location            # where am I? (precisely) = module.nodes[location]
         self.axon = axon                    # axon feeding this synapse
@@ -47,6 +42,10 @@ class Synapse(AbsUpdatable):
         self.strength = MIN_STRENGTH        # initial strength of synapse
         self.potential = REST_POTENTIAL
 
+    @cached_property
+    def key(self) -> str:
+        return f'sy-{self.id:02d}'
+
     def on_state_dump(self):
         return {
             KEY: self.key,
@@ -0,0 +1,283 @@
+"""
+    Program: ALBERT
+    Module: templates.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import numpy as np
+
+from cell import Cell
+from spine import Spine
+from topology import offsets
+from constants import *
+
+
+class CellTemplate:
+    """
+    CellTemplate holds a cell type of cell_types in model_spec.py as arrays: for each of its axons and dendrites, the
+    offsets from the cell's location of the nodes that it crosses (the cell's own location first), so that the cells
+    of a type are placed at all their locations at once by broadcasting.
+    """
+
+    def __init__(self, spec: dict, dimensions: int):
+        self.spec = spec
+        self.axon_offsets = self._offsets(spec.get(AXONS, {}), dimensions)
+        self.dendrite_offsets = self._offsets(spec.get(DENDRITES, {}), dimensions)
+
+    @staticmethod
+    def _offsets(specs: dict, dimensions: int) -> list:
+        return [np.array([(0,) * dimensions] + [tuple(location) for location in spec['relative_locs']],
+                         dtype=np.intp).reshape(-1, dimensions) for spec in specs.values()]
+
+    def place(self, locations: np.ndarray):
+        """
+        :param locations: locations of the cells, an array (cells, dimensions)
+        :return: lists, over the axons and then the dendrites of the template, of the absolute locations crossed
+                 by each of the cells' axons or dendrites: arrays (cells, nodes crossed, dimensions)
+        """
+        return [locations[:, None, :] + offsets[None] for offsets in self.axon_offsets], \
+            [locations[:, None, :] + offsets[None] for offsets in self.dendrite_offsets]
+
+
+def _coordinates(value, dimensions: tuple, name: str) -> np.ndarray:
+    coordinates = np.array(value, dtype=np.intp)
+    if coordinates.shape != (len(dimensions),):
+        raise ValueError(f"{name} {value} is not a location in a module of dimensions {dimensions}")
+    return coordinates
+
+
+def _box(form: dict, dimensions: tuple):
+    """ the start and stop (exclusive) of a placement form's box, by default the whole module """
+    return _coordinates(form.get(START, (0,) * len(dimensions)), dimensions, START), \
+        _coordinates(form.get(STOP, dimensions), dimensions, STOP)
+
+
+def _grid(start: np.ndarray, stop: np.ndarray, step: np.ndarray) -> np.ndarray:
+    """ every location from start to stop (exclusive) in steps, the first dimension varying slowest """
+    axes = [np.arange(first, last, stride) for first, last, stride in zip(start, stop, step)]
+    return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes))
+
+
+def cell_locations(cell_spec: dict, dimensions: tuple) -> np.ndarray:
+    """
+    Expand the placement of a cell type in a module's 'cells' into the locations of its cells. A cell type can be
+    placed by any of these forms, and their locations are taken in this order:
+
+        'locations': [(row, col), ...]                      listed one by one
+        'fill': {'start': (row, col), 'stop': (row, col)}   every location of the box from start to stop (exclusive);
+                                                            by default start and stop span the whole module
+        'tile': {'start', 'stop', 'step': (rows, cols),     the pattern of locations (by default only (0, 0))
+                 'pattern': [(row, col), ...]}              repeated every step across the box
+        'random': {'start', 'stop', 'density': 0.1,         each location of the box with probability density,
+                   'seed': 1}                               the same locations for the same seed (by default 0)
+
+    A location may be placed only once, by one form: forms that overlap (or a tile whose pattern overlaps itself)
+    are an error rather than being merged.
+
+    :param dimensions: dimensions of the module
+    :return: array of locations (cells, dimensions), not yet checked against the dimensions
+    :raises ValueError: if a placement is malformed, or places a location more than once
+    """
+    size = len(dimensions)
+    ones = np.ones(size, dtype=np.intp)
+    placed = []
+    if LOCATIONS in cell_spec:
+        locations = np.array(cell_spec[LOCATIONS], dtype=np.intp)
+        if locations.size and (locations.ndim != 2 or locations.shape[1] != size):
+            raise ValueError(f"{LOCATIONS} {cell_spec[LOCATIONS]} are not locations in a module "
+                             f"of dimensions {dimensions}")
+        placed.append(locations.reshape(-1, size))
+    if FILL in cell_spec:
+        placed.append(_grid(*_box(cell_spec[FILL], dimensions), ones))
+    if TILE in cell_spec:
+        tile = cell_spec[TILE]
+        step = _coordinates(tile.get(STEP, ones), dimensions, STEP)
+        if np.any(step < 1):
+            raise ValueError(f"{STEP} {tuple(step.tolist())} of a {TILE} must be positive")
+        pattern = np.array(tile.get(PATTERN, [(0,) * size]), dtype=np.intp)
+        if pattern.ndim != 2 or pattern.shape[1] != size:
+            raise ValueError(f"{PATTERN} {tile[PATTERN]} is not locations in a module of dimensions {dimensions}")
+        origins = _grid(*_box(tile, dimensions), step)
+        placed.append((origins[:, None, :] + pattern[None]).reshape(-1, size))
+    if RANDOM in cell_spec:
+        random = cell_spec[RANDOM]
+        density = random[DENSITY]
+        if not 0 <= density <= 1:
+            raise ValueError(f"{DENSITY} {density} of a {RANDOM} placement is not a probability")
+        box = _grid(*_box(random, dimensions), ones)
+        placed.append(box[np.random.default_rng(random.get(SEED, 0)).random(len(box)) < density])
+    if not placed:
+        raise ValueError(f"no placement ({LOCATIONS}, {FILL}, {TILE} or {RANDOM}) in {cell_spec}")
+    locations = np.concatenate(placed)
+    unique, counts = np.unique(locations, axis=0, return_counts=True)
+    if np.any(counts > 1):
+        raise ValueError(f"location {tuple(unique[np.argmax(counts > 1)].tolist())} is placed more than once "
+                         f"in {cell_spec}")
+    return locations
+
+
+def node_keys(locations: np.ndarray, dimensions: tuple) -> np.ndarray:
+    """ position of each location in node order, the last dimension varying slowest (see NodeGrid) """
+    return np.ravel_multi_index(tuple(locations.reshape(-1, len(dimensions)).T[::-1]), tuple(dimensions)[::-1])
+
+
+def crossings(placed: list, first: int, dimensions: tuple):
+    """
+    The nodes crossed by the axons (or dendrites) of a type of cell, in the order in which they were created:
+    cell by cell, the axons of each cell in turn, and the nodes of each axon in turn.
+
+    :param placed: the locations crossed by each axon of the cells, as from CellTemplate.place()
+    :param first: index, in the module's list of axons, of the first cell's first axon
+    :return: arrays of node keys (see node_keys()) and axon indices
+    """
+    if not placed:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    per_cell = len(placed)
+    cells = len(placed[0])
+    keys, indices, orders = [], [], []
+    for position, locations in enumerate(placed):
+        index = first + np.arange(cells)[:, None] * per_cell + position
+        keys.append(node_keys(locations, dimensions))
+        indices.append(np.broadcast_to(index, locations.shape[:2]).reshape(-1))
+        orders.append(np.broadcast_to(np.arange(locations.shape[1]), locations.shape[:2]).reshape(-1))
+    keys, indices, orders = np.concatenate(keys), np.concatenate(indices), np.concatenate(orders)
+    order = np.lexsort((orders, indices))
+    return keys[order], indices[order]
+
+
+def pairings(dendrite_keys: np.ndarray, dendrites: np.ndarray, axon_keys: np.ndarray, axons: np.ndarray,
+             node_count: int):
+    """
+    Grouped join of the dendrites and axons crossing each node on the node: every dendrite-axon pair at every node,
+    ordered by node, then dendrite, then axon, in the order of each node's lists.
+
+    :return: node key, dendrite and axon of each pair
+    """
+    dendrite_order = np.argsort(dendrite_keys, kind='stable')
+    axon_order = np.argsort(axon_keys, kind='stable')
+    dendrite_counts = np.bincount(dendrite_keys, minlength=node_count)
+    axon_counts = np.bincount(axon_keys, minlength=node_count)
+    pair_counts = dendrite_counts * axon_counts
+    nodes = np.repeat(np.arange(node_count), pair_counts)
+    local = np.arange(len(nodes)) - np.repeat(offsets(pair_counts)[:-1], pair_counts)
+    per_dendrite = axon_counts[nodes]
+    dendrite_entries = dendrite_order[offsets(dendrite_counts)[nodes] + local // per_dendrite]
+    axon_entries = axon_order[offsets(axon_counts)[nodes] + local % per_dendrite]
+    return nodes, dendrites[dendrite_entries], axons[axon_entries]
+
+
+def build_cells(module, cells_spec: dict, cell_specs: dict):
+    """
+    Create the cells of a module from their cell types, and connect their axons and dendrites with a spine for every
+    pair that cross a node (or a latent spine, see latent.py), in the same order, and so with the same keys, as
+    creating them cell by cell and connecting them node by node.
+
+    :param cells_spec: the module's 'cells': placement of each cell type (see cell_locations())
+    :param cell_specs: the cell types (cell_types in model_spec.py)
+    :raises ValueError: if a placement is malformed, a location is placed more than once (by one cell type or by
+                        two), or a cell, axon or dendrite would reach outside the module, before any cell is created
+    """
+    dimensions = tuple(module.dimensions)
+    bounds = np.array(dimensions)
+    placed = []
+    for cell_type, cell_spec in cells_spec.items():
+        template = CellTemplate(cell_specs[cell_type], len(dimensions))
+        locations = cell_locations(cell_spec, dimensions)
+        axons, dendrites = template.place(locations)
+        for array in [locations[:, None, :]] + axons + dendrites:
+            outside = np.any((array < 0) | (array >= bounds), axis=-1)
+            if outside.any():
+                cell = np.argwhere(outside)[0][0]
+                raise ValueError(f"{cell_type} at {tuple(locations[cell].tolist())} reaches outside module "
+                                 f"{module.key} of dimensions {dimensions}")
+        placed.append((template, locations, axons, dendrites))
+    # a node holds at most one cell, of one type
+    if placed:
+        all_locations = np.concatenate([locations for _, locations, _, _ in placed])
+        keys = node_keys(all_locations, dimensions)
+        unique, counts = np.unique(keys, return_counts=True)
+        if np.any(counts > 1):
+            repeated = np.flatnonzero(keys == unique[np.argmax(counts > 1)])
+            types = np.repeat(list(cells_spec), [len(locations) for _, locations, _, _ in placed])[repeated]
+            raise ValueError(f"location {tuple(all_locations[repeated[0]].tolist())} of module {module.key} is "
+                             f"placed by both {types[0]} and {types[1]}")
+    # cells, axons and dendrites, and the nodes that they cross
+    axon_keys, axon_indices, dendrite_keys, dendrite_indices = [], [], [], []
+    for template, locations, axons, dendrites in placed:
+        first_axon, first_dendrite = len(module.axons), len(module.dendrites)
+        axon_lists = [array.tolist() for array in axons]
+        dendrite_lists = [array.tolist() for array in dendrites]
+        for index, location in enumerate(locations.tolist()):
+            cell = Cell(module, tuple(location), template.spec,
+                        [[tuple(loc) for loc in locs[index]] for locs in axon_lists],
+                        [[tuple(loc) for loc in locs[index]] for locs in dendrite_lists])
+            module.cells[cell.key] = cell
+            module.nodes[cell.location].cells[cell.key] = cell
+            module.axons.extend(cell.axons)
+            module.dendrites.extend(cell.dendrites)
+        keys, indices = crossings(axons, first_axon, dimensions)
+        axon_keys.append(keys)
+        axon_indices.append(indices)
+        keys, indices = crossings(dendrites, first_dendrite, dimensions)
+        dendrite_keys.append(keys)
+        dendrite_indices.append(indices)
+    axon_keys, axon_indices = np.concatenate(axon_keys or [[]]).astype(np.intp), \
+        np.concatenate(axon_indices or [[]]).astype(np.intp)
+    dendrite_keys, dendrite_indices = np.concatenate(dendrite_keys or [[]]).astype(np.intp), \
+        np.concatenate(dendrite_indices or [[]]).astype(np.intp)
+    # the nodes crossed, in node order, and each crossing's position among them
+    crossed, ranks = np.unique(np.concatenate([dendrite_keys, axon_keys]), return_inverse=True)
+    dendrite_keys, axon_keys = ranks[:len(dendrite_keys)], ranks[len(dendrite_keys):]
+    locations = np.stack(np.unravel_index(crossed, dimensions[::-1])[::-1], axis=-1)
+    nodes = [module.nodes[location] for location in map(tuple, locations.tolist())]
+    for key, index in zip(dendrite_keys.tolist(), dendrite_indices.tolist()):
+        nodes[key].dendrites.append(module.dendrites[index])
+    for key, index in zip(axon_keys.tolist(), axon_indices.tolist()):
+        nodes[key].axons.append(module.axons[index])
+    # spines: every dendrite-axon pair at each node, except between the dendrites and axons of the same cell
+    # (which gives uncontrolled feedback)
+    cells = list(module.cells.values())
+    cell_index = {cell: index for index, cell in enumerate(cells)}
+    dendrite_cell = np.array([cell_index[dendrite.parent] for dendrite in module.dendrites], dtype=np.intp)
+    axon_cell = np.array([cell_index[axon.parent] for axon in module.axons], dtype=np.intp)
+    pair_nodes, pair_dendrites, pair_axons = pairings(dendrite_keys, dendrite_indices, axon_keys, axon_indices,
+                                                      len(nodes))
+    keep = dendrite_cell[pair_dendrites] != axon_cell[pair_axons]
+    pair_nodes, pair_dendrites, pair_axons = pair_nodes[keep], pair_dendrites[keep], pair_axons[keep]
+    # connect each axon's cell (parent) to each dendrite's cell (child)
+    links = np.unique(axon_cell[pair_axons] * len(cells) + dendrite_cell[pair_dendrites])
+    for parent, child in zip((links // len(cells)).tolist(), (links % len(cells)).tolist()):
+        cells[parent].children.add(cells[child])
+    if module.lazy_spines:
+        # the spines are created when their axon first becomes active
+        ids = module.brain.ids
+        module.latent.extend(locations[pair_nodes], pair_dendrites, pair_axons,
+                             ids.allocate(SPINE, len(pair_nodes)), ids.allocate(SYNAPSE, len(pair_nodes)))
+        return
+    for key, dendrite_index, axon_index in zip(pair_nodes.tolist(), pair_dendrites.tolist(), pair_axons.tolist()):
+        node = nodes[key]
+        dendrite = module.dendrites[dendrite_index]
+        axon = module.axons[axon_index]
+        spine = Spine(module, node.location, dendrite, axon)
+        node.spines.append(spine)
+        dendrite.spines.append(spine)
+        dendrite.awake.add(spine)
+        axon.spines.append(spine)
+        module.spines.append(spine)
+        module.synapses.append(spine.synapse)
@@ -0,0 +1,207 @@
+"""
+    Program: ALBERT
+    Module: topology.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+from functools import cached_property
+
+import numpy as np
+
+from constants import SENSOR, CELLS, DENDRITES, AXONS, SPINES
+
+
+class Topology:
+    """
+    Topology compiles the fixed structure of a module into index arrays, once, after its nodes have connected.
+
+    Cells are numbered in evaluation order: layer by layer (see evaluation_layers()), followed by any cells that
+    no sensor reaches, which are never updated. The dendrites and axons of each cell, and the spines of each
+    dendrite, are numbered consecutively, so every layer of cells owns a contiguous range of each component.
+
+    One-to-many relations are held in CSR form, ie the dendrites of cell i are
+    dendrites[cell_dendrite_offsets[i]:cell_dendrite_offsets[i + 1]], and the cells of layer k are
+    cells[layer_offsets[k]:layer_offsets[k + 1]]. Many-to-one relations are plain index arrays,
+    eg spine_axon[j] is the index of the axon feeding spine j.
+
+    A spine of a bridge (see Bridge) is fed by an axon of another module: such axons are listed in bridge_axons and
+    numbered after the module's own, so spine_axon[j] >= len(axons) for the spines of bridges.
+    """
+
+    def __init__(self, module):
+        layers = evaluation_layers(module.cells.values())
+        self.schedule = [cell for layer in layers for cell in layer]
+        scheduled = set(self.schedule)
+        self.cells = self.schedule + [cell for cell in module.cells.values() if cell not in scheduled]
+        self.dendrites = [dendrite for cell in self.cells for dendrite in cell.dendrites]
+        self.axons = [axon for cell in self.cells for axon in cell.axons]
+        self.spines = [spine for dendrite in self.dendrites for spine in dendrite.spines]
+        axon_index = {axon: index for index, axon in enumerate(self.axons)}
+        # axons of other modules feeding spines of this one, through bridges
+        self.bridge_axons = []
+        for spine in self.spines:
+            if spine.axon not in axon_index:
+                axon_index[spine.axon] = len(axon_index)
+                self.bridge_axons.append(spine.axon)
+        # layer -> cells, cell -> dendrites, cell -> axons, dendrite -> spines
+        self.layer_offsets = offsets([len(layer) for layer in layers])
+        self.cell_dendrite_offsets = offsets([len(cell.dendrites) for cell in self.cells])
+        self.cell_axon_offsets = offsets([len(cell.axons) for cell in self.cells])
+        self.dendrite_spine_offsets = offsets([len(dendrite.spines) for dendrite in self.dendrites])
+        # dendrite -> cell, axon -> cell, spine -> dendrite, spine -> axon
+        self.dendrite_cell = owners(self.cell_dendrite_offsets)
+        self.axon_cell = owners(self.cell_axon_offsets)
+        self.spine_dendrite = owners(self.dendrite_spine_offsets)
+        self.spine_axon = np.array([axon_index[spine.axon] for spine in self.spines], dtype=np.intp)
+        # axon -> spines: spine indices grouped by feeding axon
+        self.axon_spines = np.argsort(self.spine_axon, kind='stable')
+        self.axon_spine_offsets = offsets(np.bincount(self.spine_axon, minlength=len(axon_index)))
+        # occupied nodes (flat, row-major index of each in the module's grid), and the node (index among the occupied
+        # nodes) of each cell and spine, and of each dendrite location
+        self.node_grid = np.flatnonzero(module.nodes.occupied)
+        self.node_count = len(self.node_grid)
+        self.cell_node = self.nodes_of([cell.location for cell in self.cells], module.dimensions)
+        self.spine_node = self.nodes_of([spine.location for spine in self.spines], module.dimensions)
+        self.dendrite_location_offsets = offsets([len(dendrite.locations) for dendrite in self.dendrites])
+        self.dendrite_location_dendrite = owners(self.dendrite_location_offsets)
+        self.dendrite_location_node = self.nodes_of(
+            [location for dendrite in self.dendrites for location in dendrite.locations], module.dimensions)
+
+    @cached_property
+    def ids(self) -> dict:
+        """ ids of the cells, dendrites, axons and spines, in this order (eg to match the state in a checkpoint) """
+        return {kind: np.array([component.id for component in components], dtype=np.int64)
+                for kind, components in ((CELLS, self.cells), (DENDRITES, self.dendrites), (AXONS, self.axons),
+                                         (SPINES, self.spines))}
+
+    def nodes_of(self, locations: list, dimensions: tuple) -> np.ndarray:
+        """ indices, among the occupied nodes, of the nodes at a list of (occupied) location tuples """
+        if not locations:
+            return np.zeros(0, dtype=np.intp)
+        flat = np.ravel_multi_index(tuple(np.array(locations).T), dimensions)
+        return np.searchsorted(self.node_grid, flat).astype(np.intp)
+
+    def layer_ranges(self):
+        """
+        :return: for each layer, slices of the cells, dendrites, spines and axons that it owns
+        """
+        ranges = []
+        for first, last in zip(self.layer_offsets[:-1], self.layer_offsets[1:]):
+            dendrites = slice(self.cell_dendrite_offsets[first], self.cell_dendrite_offsets[last])
+            ranges.append((
+                slice(first, last),
+                dendrites,
+                slice(self.dendrite_spine_offsets[dendrites.start], self.dendrite_spine_offsets[dendrites.stop]),
+                slice(self.cell_axon_offsets[first], self.cell_axon_offsets[last]),
+            ))
+        return ranges
+
+
+def evaluation_layers(cells) -> list:
+    """
+    Order the cells reached from the sensors into layers that can each be updated in one pass, as Module.on_tick()
+    did with a breadth-first walk from the sensors on every tick: layer k holds the cells k connections from the
+    nearest sensor. A cell reads the activity of its parents in earlier layers from this tick, and that of the
+    others (feedback loops, and connections from cells further from the sensors) from the last one: they are
+    picked up in the next pass, as before.
+
+    :param cells: all cells of a module
+    :return: list of layers, each a list of cells in module order
+    """
+    cells = list(cells)
+    # breadth-first distance from the sensors of each reachable cell
+    depth = {cell: 0 for cell in cells if cell.cell_type == SENSOR}
+    frontier = list(depth)
+    while frontier:
+        next_frontier = []
+        for cell in frontier:
+            for child in cell.children:
+                if child not in depth:
+                    depth[child] = depth[cell] + 1
+                    next_frontier.append(child)
+        frontier = next_frontier
+    layers = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+    for cell in cells:
+        if cell in depth:
+            layers[depth[cell]].append(cell)
+    return layers
+
+
+def offsets(counts) -> np.ndarray:
+    """ CSR offsets (length n + 1) for rows holding the given numbers of items """
+    return np.concatenate(([0], np.cumsum(counts, dtype=np.intp))).astype(np.intp)
+
+
+def owners(row_offsets: np.ndarray) -> np.ndarray:
+    """ row index of each item in a CSR layout """
+    return np.repeat(np.arange(len(row_offsets) - 1), np.diff(row_offsets))
+
+
+def expand(row_offsets: np.ndarray, rows: np.ndarray):
+    """
+    Gather the items of the given rows of a CSR layout.
+
+    :return: item indices, row by row, and the number of items in each row
+    """
+    starts = row_offsets[rows]
+    counts = row_offsets[rows + 1] - starts
+    total = counts.sum()
+    # arange over all items, shifted so that each row continues from its own start
+    shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return np.arange(total, dtype=np.intp) + shifts, counts
+
+
+def group(keys: np.ndarray, count: int):
+    """
+    Group items by key.
+
+    :param keys: key (0..count-1) of each item
+    :return: item indices ordered by key, and the Segments of that ordering holding each key's items
+    """
+    return np.argsort(keys, kind='stable'), Segments(np.bincount(keys, minlength=count))
+
+
+class Segments:
+    """
+    Consecutive segments, of given lengths, of an array of values, prepared for repeated segmented reductions.
+    Segment i holds values[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, counts: np.ndarray):
+        self.count = len(counts)
+        self.offsets = offsets(counts)
+        self.filled = counts > 0
+        self.starts = self.offsets[:-1][self.filled]
+        self.all_filled = bool(self.filled.all())
+
+    def reduce(self, ufunc: np.ufunc, values: np.ndarray, initial: float) -> np.ndarray:
+        """
+        ufunc reduction of initial and the values of each segment, eg reduce(np.add, values, 0.0). The segments run
+        along the last axis of values, so leading axes (eg the replicas of an ensemble) are reduced row by row.
+        """
+        if self.all_filled and self.count:
+            return ufunc(ufunc.reduceat(values, self.starts, axis=-1), initial)
+        result = np.full(values.shape[:-1] + (self.count,), initial, dtype=float)
+        if len(self.starts):
+            result[..., self.filled] = ufunc(ufunc.reduceat(values, self.starts, axis=-1), initial)
+        return result
+
+    def max(self, values: np.ndarray, initial: float) -> np.ndarray:
+        """ max(initial, values of each segment) """
+        return self.reduce(np.maximum, values, initial)
@@ -28,12 +28,13 @@ from model_spec import training_data, BIAS_ON, TRAINING_START_CYCLE, TRAINING_CY
 
 class Trainer:
 
-    def __init__(self, randomise=False):
+    def __init__(self, randomise=False, seed=123456789):
 
-        random.seed(123456789)
+        self.random = random.Random(seed)
         self.randomise = randomise
         self.brain = None
         self.data_row = {}
+        self.presented_row = {}  # row of training values last presented to each module
         self.cycle = 0
 
     def on_tick(self):
@@ -70,10 +71,11 @@ class Trainer:
                         module.cells[cell_key].injected_potential = \
                             training_data[module.key]['values'][self.data_row[module.key]][cell]
                         cell += 1
+                self.presented_row[module.key] = self.data_row[module.key]
 
                 # select the next data row
                 if self.randomise:
-                    self.data_row[module.key] = random.randint(0, len(training_data[module.key]['values']) - 1)
+                    self.data_row[module.key] = self.random.randint(0, len(training_data[module.key]['values']) - 1)
                 else:
                     # cycle through the set of data values
                     self.data_row[module.key] = \
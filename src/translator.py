@@ -22,14 +22,24 @@ __status__ = "Production"
 
 import logging
 from copy import deepcopy
+from functools import partial
 
 import numpy as np
 
 from constants import *
-from model_spec import REST_POTENTIAL, MAX_STRENGTH
+from model_spec import REST_POTENTIAL, MIN_LENGTH, MIN_STRENGTH, MAX_STRENGTH
+
+# values of spines and synapses that have not been created yet (see latent.py), which are missing from state dumps
+RESTING = {POTENTIAL: REST_POTENTIAL, LENGTH: MIN_LENGTH, STRENGTH: MIN_STRENGTH}
 
 
 class DataTranslator:
+    """
+    DataTranslator translates the model's state into the data of the plots in a plot request (see plot_request in
+    model_spec.py). The request is compiled once, with the first state: the figure layout, subplot positions,
+    titles, labels and ranges are worked out, and each plot is given a function that gathers its values from a
+    state into its data, in place. translate() then only gathers the values of each new state.
+    """
 
     def __init__(self, plot_request, model_data):
         self.figure_data, self.plot_request = self.split_request(deepcopy(plot_request))
@@ -37,7 +47,9 @@ class DataTranslator:
         self.sub_plots = []
         self.modules = set([])
         self.plot_data = []
-        self.translate()
+        self.gathers = []   # per plot: function gathering its values from a state
+        self.compile()
+        self.translate(model_data)
 
     @staticmethod
     def split_request(plot_request):
@@ -50,7 +62,7 @@ class DataTranslator:
                 plt_request.append(request)
         return fig_request, plt_request
 
-    def translate(self):
+    def compile(self):
         self.translate_figure()
         for item in self.plot_request:
             if item[PLOT_TYPE] == CELL_MAP:
@@ -62,6 +74,13 @@ class DataTranslator:
             else:
                 logging.info(f"Unrecognised plot type: {item['type']}")
 
+    def translate(self, model_data):
+        """ gather the values of a new state into the figure and plot data """
+        self.model_data = model_data
+        self.figure_data[TIME_ALIVE_CYCLES] = model_data[TIME_ALIVE_CYCLES]
+        for gather in self.gathers:
+            gather(model_data)
+
     def translate_figure(self):
         def item_key(item: dict):
             return item[MODULE]
@@ -79,7 +98,6 @@ class DataTranslator:
             self.sub_plots.append(item[SUBPLOT])
         self.figure_data[DIMENSIONS] = (max_rows, max_cols * module_count)
         self.figure_data[SUBPLOTS] = self.sub_plots
-        self.figure_data[TIME_ALIVE_CYCLES] = self.model_data[TIME_ALIVE_CYCLES]
 
     def translate_cell_map(self, request):
         module_data = self.model_data[MODULES][request[MODULE]]
@@ -89,12 +107,14 @@ class DataTranslator:
         request[X_RANGE] = (- 0.5, dimensions[1] - 0.5)
         request[Y_RANGE] = (- 0.5, dimensions[0] - 0.5)
         request[TITLE] = module_data[DESCRIPTION] + f' {request[MODULE]}'
-        request[CELLS] = module_data[CELLS]
-        request[AXONS] = module_data[AXONS]
-        request[DENDRITES] = module_data[DENDRITES]
-        request[SPINES] = module_data[SPINES]
-        request[SYNAPSES] = module_data[SYNAPSES]
         self.plot_data.append(request)
+        self.gathers.append(partial(self.gather_cell_map, request))
+
+    @staticmethod
+    def gather_cell_map(request, model_data):
+        module_data = model_data[MODULES][request[MODULE]]
+        for items in (CELLS, AXONS, DENDRITES, SPINES, SYNAPSES):
+            request[items] = module_data[items]
 
     def translate_heat_map(self, request):
         # adds: data['xy-data'], data['v-min'], data['v-max']
@@ -107,14 +127,19 @@ class DataTranslator:
         request[X_RANGE] = (- 0.5, dimensions[1] - 0.5)
         request[Y_RANGE] = (- 0.5, dimensions[0] - 0.5)
         request[TITLE] = module_data[DESCRIPTION] + f' {request[MODULE]}'
-        variable = request[VARIABLE]
-        xy_data = np.full(dimensions, REST_POTENTIAL)
-        for key, node in module_data[NODES].items():
-            row = key[0]
-            column = key[1]
-            xy_data[row][column] = node[variable]
-        request[XY_DATA] = xy_data
+        # for 3D modules, the maximum through the layers, gathered into a grid of its own
+        request[XY_DATA] = np.empty(tuple(dimensions[:2])) if len(dimensions) > 2 else None
         self.plot_data.append(request)
+        self.gathers.append(partial(self.gather_heat_map, request))
+
+    @staticmethod
+    def gather_heat_map(request, model_data):
+        # the module dumps its node potentials as a dense grid
+        xy_data = model_data[MODULES][request[MODULE]][NODE_POTENTIAL]
+        if xy_data.ndim == 2:
+            request[XY_DATA] = xy_data
+        else:
+            np.max(xy_data, axis=2, out=request[XY_DATA])
 
     def translate_lines(self, request):
         variable = request[VARIABLE]
@@ -139,12 +164,15 @@ class DataTranslator:
                 {TITLE: f'Unrecognised variable "{variable}"" requested',
                     Y_LABEL: 'None', X_LABEL: 'None',
                     Y_RANGE: [0, 1], X_RANGE: [-50, 0], Y_BASE: 0})
-        # copy data values to the expanded request
-        data = self.model_data[MODULES][request[MODULE]]
-        item_keys = request[ITEM_KEYS]
-        y_data = {}
-        for key in item_keys:
-            y_data[key] = data[items][key][variable]
-
-        request[Y_DATA] = y_data
+        request[Y_DATA] = {key: None for key in request[ITEM_KEYS]}
         self.plot_data.append(request)
+        self.gathers.append(partial(self.gather_lines, request, RESTING.get(variable)))
+
+    @staticmethod
+    def gather_lines(request, resting, model_data):
+        # copy data values to the expanded request
+        data = model_data[MODULES][request[MODULE]][request[ITEMS]]
+        variable = request[VARIABLE]
+        y_data = request[Y_DATA]
+        for key in y_data:
+            y_data[key] = data[key][variable] if key in data else resting
@@ -0,0 +1,291 @@
+"""
+    Program: ALBERT
+    Module: transport.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+"""
+Shared memory transport of the brain's state from the Actor to the Monitor.
+
+The Actor publishes the numeric state of every component (see checkpoint.STATE), the node potentials, the module
+biases and the bridge activity as one flat array of floats in a shared memory segment, double buffered: each frame
+is written into the buffer not holding the frame before, which is stamped with its frame number once complete.
+The Monitor reads the latest complete frame in place and applies the values that have changed to its copy of the
+state dump (see Brain.on_state_dump()).
+
+The static parts of the state travel through the pipe, as a handshake: the first state dump, the name of the
+segment and the layout of the frame, sent again (as a delta of the dumps, see delta.py) whenever the connectivity
+of a module changes, eg as latent spines are created. Otherwise the pipe carries only control messages.
+
+Once the monitor has sent its subscription (see subscription.py), the dumps and frames hold only the parts of the
+state that its plots watch, so that their cost depends on what is watched rather than on the size of the brain.
+"""
+
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from checkpoint import STATE as COMPONENT_STATE, module_components
+from delta import DeltaEncoder, DeltaDecoder
+from model_spec import FIRING_POTENTIAL
+from constants import *
+
+# segment header (int64): latest frame; the frame in each buffer (-1 while being written); the time alive of each
+HEADER = 5
+
+
+def _views(memory, size: int) -> tuple:
+    """ :return: the header and the two buffers of a segment """
+    header = np.ndarray((HEADER,), dtype=np.int64, buffer=memory.buf)
+    buffers = np.ndarray((2, size), dtype=np.float64, buffer=memory.buf, offset=header.nbytes)
+    return header, buffers
+
+
+class StatePublisher:
+    """ StatePublisher publishes the state of a brain into shared memory, for the Actor """
+
+    def __init__(self, brain):
+        self.brain = brain
+        self.deltas = DeltaEncoder()    # handshake state dumps, sent as deltas of the one before
+        self.subscription = None        # the parts of the state watched by the monitor, None: all of it
+        self.topologies = None          # the module topologies that the layout was made for
+        self.sources = None             # per field: function returning its values
+        self.bounds = None              # per field: first and last + 1 value in the frame
+        self.memory = None
+        self.header = None
+        self.buffers = None
+        self.frame = 0
+
+    def subscribe(self, subscription):
+        """ publish only the parts of the state watched by a subscription (see subscription.py), from the next frame """
+        self.subscription = subscription
+        self.topologies = None
+
+    def _layout(self) -> list:
+        """ :return: the fields of a frame: module key, items, attribute, number of values and item keys """
+        subscription = self.subscription
+        fields = []
+        self.sources = []
+        for module in self.brain.modules:
+            topology = module.topology
+            keys = {
+                CELLS: [cell.key for cell in topology.cells],
+                DENDRITES: [dendrite.key for dendrite in topology.dendrites],
+                AXONS: [axon.key for axon in topology.axons],
+                SPINES: [spine.key for spine in topology.spines],
+                SYNAPSES: [spine.synapse.key for spine in topology.spines],
+            }
+            components = module_components(module)
+            for name, (kind, attribute) in COMPONENT_STATE.items():
+                index = None
+                if subscription is not None:
+                    field = (module.key, kind, attribute)
+                    if field not in subscription.fields:
+                        continue
+                    if subscription.fields[field] is not None:
+                        # the watched items that there are, in the order of the topology
+                        watched = set(subscription.fields[field])
+                        index = [position for position, key in enumerate(keys[kind]) if key in watched]
+                kind_keys = keys[kind] if index is None else [keys[kind][position] for position in index]
+                fields.append((module.key, kind, attribute, len(kind_keys), kind_keys))
+                self.sources.append(self._source(module, name, components[kind], attribute, index))
+            if subscription is None or module.key in subscription.grids:
+                fields.append((module.key, NODES, POTENTIAL, module.node_potential.size, None))
+                self.sources.append(lambda module=module: module.node_potential.reshape(-1))
+            fields.append((module.key, MODULE, BIAS, 1, None))
+            self.sources.append(lambda module=module: module.bias)
+        if subscription is None:
+            bridges = self.brain.bridges
+            fields.append((None, BRIDGES, ACTIVE, len(bridges), [bridge.key for bridge in bridges]))
+            self.sources.append(lambda: [bridge.active for bridge in bridges])
+        stops = np.cumsum([field[3] for field in fields])
+        self.bounds = list(zip([0] + stops[:-1].tolist(), stops.tolist()))
+        return fields
+
+    @staticmethod
+    def _source(module, name: str, components: list, attribute: str, index: list = None):
+        """
+        the values of a state variable of a module's components: from the engine's array or the objects
+
+        :param index: positions of the components to publish, in the order of the topology; None for all of them
+        """
+        if module.engine is None:
+            if index is not None:
+                components = [components[position] for position in index]
+            return lambda: [getattr(component, attribute) for component in components]
+        engine = module.engine
+        if index is None:
+            return lambda: getattr(engine if engine.replica is None else engine.replica, name)
+        index = np.array(index, dtype=np.intp)
+        return lambda: getattr(engine if engine.replica is None else engine.replica, name)[index]
+
+    def publish(self, time_alive: int):
+        """
+        Publish the state of the brain as the next frame, between ticks.
+
+        :return: the handshake to send the monitor, if the layout of the frame has changed, else None
+        """
+        handshake = None
+        modules = self.brain.modules
+        for module in modules:
+            if module.topology is None:
+                module.compile()
+        if self.topologies is None or any(module.topology is not topology
+                                          for module, topology in zip(modules, self.topologies)):
+            handshake = self._handshake(time_alive)
+        self.frame += 1
+        buffer = self.frame % 2
+        self.header[1 + buffer] = -1
+        values = self.buffers[buffer]
+        for source, (start, stop) in zip(self.sources, self.bounds):
+            values[start:stop] = source()
+        self.header[3 + buffer] = time_alive
+        self.header[1 + buffer] = self.frame
+        self.header[0] = self.frame
+        return handshake
+
+    def _handshake(self, time_alive: int) -> dict:
+        """ lay out frames for the brain's current connectivity, in a new segment """
+        self.topologies = [module.topology for module in self.brain.modules]
+        fields = self._layout()
+        size = max(self.bounds[-1][1], 1)
+        self.close()
+        self.memory = shared_memory.SharedMemory(create=True, size=HEADER * 8 + 2 * size * 8)
+        self.header, self.buffers = _views(self.memory, size)
+        self.header[:] = 0
+        state = self.brain.on_state_dump(self.subscription)
+        state[TIME_ALIVE_CYCLES] = time_alive
+        return {SEGMENT: self.memory.name, FIELDS: fields, STATE: self.deltas.encode(state)}
+
+    def close(self):
+        """ remove the segment; a monitor that has it open keeps it until it closes it """
+        if self.memory is not None:
+            self.header = self.buffers = None
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+class StateReader:
+    """ StateReader keeps the Monitor's copy of the brain's state up to date from the frames that are published """
+
+    def __init__(self):
+        self.deltas = DeltaDecoder()
+        self.state = None
+        self.memory = None
+        self.header = None
+        self.buffers = None
+        self.setters = None     # per field: function applying changed values to the state
+        self.starts = None      # per field: its first value in the frame
+        self.applied = None     # the values last applied to the state
+        self.frame = 0
+
+    def on_handshake(self, handshake: dict):
+        """ take up a new layout and segment, from the actor """
+        self.state = self.deltas.decode(handshake[STATE])
+        self._share_bridge_components()
+        self.close()
+        # the actor removes the segment, so this process's resource tracker must not remove it too (at exit): from
+        # Python 3.13 the segment can be attached untracked, before that it is tracked on attaching and unregistered
+        # by its private (platform) name
+        if sys.version_info >= (3, 13):
+            self.memory = shared_memory.SharedMemory(handshake[SEGMENT], track=False)
+        else:
+            self.memory = shared_memory.SharedMemory(handshake[SEGMENT])
+            resource_tracker.unregister(self.memory._name, 'shared_memory')
+        fields = handshake[FIELDS]
+        size = max(sum([field[3] for field in fields]), 1)
+        self.header, self.buffers = _views(self.memory, size)
+        self.setters = [self._setter(*field) for field in fields]
+        self.starts = np.cumsum([0] + [field[3] for field in fields])
+        self.applied = np.full(size, np.nan)
+        self.frame = 0
+
+    def _share_bridge_components(self):
+        """ point the axon and dendrite in each bridge's state at theirs in the state of the module, to update both """
+        components = {}
+        for module_state in self.state[MODULES].values():
+            components.update(module_state[AXONS])
+            components.update(module_state[DENDRITES])
+        for bridge in self.state[BRIDGES].values():
+            for item in (AXON, DENDRITE):
+                if isinstance(bridge.get(item), dict) and bridge[item].get(KEY) in components:
+                    bridge[item] = components[bridge[item][KEY]]
+
+    def _setter(self, module_key: str, items: str, attribute: str, count: int, keys: list):
+        """ :return: function applying changed values (by offset in the field) to the state """
+        convert = bool if attribute in (ACTIVE, CONNECTED) else float
+        if items == BRIDGES:
+            targets = [self.state[BRIDGES][key] for key in keys]
+        elif items == MODULE:
+            targets = [self.state[MODULES][module_key]]
+        elif items == NODES:
+            module_state = self.state[MODULES][module_key]
+            grid = module_state[NODE_POTENTIAL].reshape(-1)
+            shape = module_state[NODE_POTENTIAL].shape
+            nodes = {np.ravel_multi_index(location, shape): node for location, node in module_state[NODES].items()}
+
+            def set_nodes(offsets: np.ndarray, values: np.ndarray):
+                grid[offsets] = values
+                for offset, value in zip(offsets.tolist(), values.tolist()):
+                    if offset in nodes:
+                        nodes[offset][POTENTIAL] = value
+            return set_nodes
+        else:
+            components = self.state[MODULES][module_key][items]
+            targets = [components[key] for key in keys]
+
+        def set_items(offsets: np.ndarray, values: np.ndarray):
+            for offset, value in zip(offsets.tolist(), values.tolist()):
+                target = targets[offset]
+                target[attribute] = convert(value)
+                if items == DENDRITES:
+                    target[ACTIVE] = value >= FIRING_POTENTIAL
+        return set_items
+
+    def read(self):
+        """ :return: the state, updated from the latest frame, or None if there is no complete new frame """
+        if self.memory is None:
+            return None
+        frame = int(self.header[0])
+        if frame == self.frame:
+            return None
+        buffer = frame % 2
+        values = self.buffers[buffer]
+        changed = np.flatnonzero(values != self.applied)
+        changed_values = values[changed]
+        time_alive = int(self.header[3 + buffer])
+        if self.header[1 + buffer] != frame:
+            # overwritten while being read: read the next one
+            return None
+        self.applied[changed] = changed_values
+        bounds = np.searchsorted(changed, self.starts)
+        for setter, start, first, last in zip(self.setters, self.starts, bounds[:-1], bounds[1:]):
+            if first < last:
+                setter(changed[first:last] - start, changed_values[first:last])
+        self.state[TIME_ALIVE_CYCLES] = time_alive
+        self.frame = frame
+        return self.state
+
+    def close(self):
+        if self.memory is not None:
+            self.header = self.buffers = None
+            self.memory.close()
+            self.memory = None
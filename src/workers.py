@@ -0,0 +1,157 @@
+"""
+    Program: ALBERT
+    Module: workers.py
+
+    This program is free software; you can redistribute it and/or
+    modify it under the terms of the GNU General Public License
+    version 2 as published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU General Public License for more details.
+"""
+__author__ = "Ray Jackson"
+__copyright__ = "Copyright 2019, Ray Jackson"
+__credits__ = []
+__license__ = "GNU GPL"
+__version__ = "1.0.0"
+__maintainer__ = "Ray Jackson"
+__email__ = ""
+__status__ = "Production"
+
+import logging
+import mmap
+import multiprocessing
+from threading import BrokenBarrierError
+
+import numpy as np
+
+# commands from the brain to its workers
+STOP = 0
+TICK = 1
+SETTLED_TICKS = 2
+FAST_FORWARD = 3
+
+
+def shared_array(array: np.ndarray) -> np.ndarray:
+    """ copy of a numpy array in anonymous shared memory, which processes forked after the copy share """
+    buffer = mmap.mmap(-1, max(array.nbytes, 1))
+    shared = np.frombuffer(buffer, dtype=array.dtype, count=array.size).reshape(array.shape)
+    shared[...] = array
+    return shared
+
+
+class ModuleWorkers:
+    """
+    ModuleWorkers steps the modules of a brain in worker processes, each process stepping a group of modules,
+    so that a tick takes as long as the slowest group rather than all the modules in turn.
+
+    The workers are forked from the process that owns the brain, after the state of every module has been moved
+    into shared memory (see Engine.share()): the brain's own objects remain views onto that state, so state dumps,
+    plots and the trainer work as before. Each command (tick, settled ticks, fast forward) is passed through a
+    shared control array between two barriers: the first starts the workers, the second waits for the slowest.
+    Module biases, the results of commands and the activity of the bridge axons (see Bridge) are exchanged through
+    shared arrays: the brain passes the activity at the source of each bridge on at the end of every tick, from the
+    shared state of the module there, and the workers take it up before the next command.
+
+    The connectivity of the modules must not change once the workers have started.
+    """
+
+    def __init__(self, brain, processes: int):
+        self.brain = brain
+        modules = brain.modules
+        # workers need the modules' state in arrays, and fixed connectivity
+        for module in modules:
+            if module.latent is not None:
+                module.spine_budget = 0
+                module.latent.materialise_all()
+            if module.engine is None:
+                module.array_engine = True
+                module.compile()
+            module.engine.share(shared_array)
+        self.groups = self.group(modules, processes)
+        # control: command and its argument; per module: bias and result; per bridge axon: activity
+        self.control = shared_array(np.zeros(2, dtype=np.int64))
+        self.bias = shared_array(np.zeros(len(modules), dtype=float))
+        self.results = shared_array(np.zeros(len(modules), dtype=np.int64))
+        self.bridge_axons = [axon for bridge in brain.bridges for axon in bridge.bridge_axons]
+        self.bridge_axon_active = shared_array(np.zeros(len(self.bridge_axons), dtype=bool))
+        context = multiprocessing.get_context('fork')
+        self.barrier = context.Barrier(len(self.groups) + 1)
+        self.processes = [context.Process(target=self._work, args=(group,), daemon=True) for group in self.groups]
+        for process in self.processes:
+            process.start()
+        logging.info(f"modules stepped in {len(self.processes)} worker processes: "
+                     f"{[[modules[index].key for index in group] for group in self.groups]}")
+
+    @staticmethod
+    def group(modules: list, processes: int) -> list:
+        """
+        Share the modules between up to the given number of processes, balancing their numbers of spines.
+
+        :return: list of groups, each a list of module indices
+        """
+        groups = [[] for _ in range(max(1, min(processes, len(modules))))]
+        loads = [0] * len(groups)
+        for index in sorted(range(len(modules)), key=lambda i: -len(modules[i].spines)):
+            lightest = loads.index(min(loads))
+            groups[lightest].append(index)
+            loads[lightest] += len(modules[index].spines) + 1
+        return [sorted(group) for group in groups]
+
+    def _command(self, command: int, argument: int = 0):
+        """ run a command in every worker, and wait for the slowest to finish """
+        self.control[:] = command, argument
+        self.bias[:] = [module.bias for module in self.brain.modules]
+        self.bridge_axon_active[:] = [axon.active for axon in self.bridge_axons]
+        self.barrier.wait()
+        self.barrier.wait()
+
+    def _work(self, group: list):
+        """ worker process: carry out commands on a group of modules until told to stop """
+        modules = [self.brain.modules[index] for index in group]
+        bridge_axons = [(index, axon) for index, axon in enumerate(self.bridge_axons) if axon.module in modules]
+        try:
+            while True:
+                self.barrier.wait()
+                command, argument = int(self.control[0]), int(self.control[1])
+                if command == STOP:
+                    return
+                for index, axon in bridge_axons:
+                    axon.relay(bool(self.bridge_axon_active[index]))
+                for index, module in zip(group, modules):
+                    module.bias = float(self.bias[index])
+                    if command == TICK:
+                        module.on_tick()
+                    elif command == SETTLED_TICKS:
+                        self.results[index] = module.settled_ticks(argument)
+                    elif command == FAST_FORWARD:
+                        module.fast_forward(argument)
+                self.barrier.wait()
+        except BrokenBarrierError:
+            return
+        except Exception:
+            # release the brain and the other workers
+            self.barrier.abort()
+            raise
+
+    def on_tick(self):
+        self._command(TICK)
+
+    def settled_ticks(self, limit: int) -> int:
+        """ the number of ticks, up to limit, that every module can fast forward (see Module.settled_ticks()) """
+        self._command(SETTLED_TICKS, limit)
+        return int(self.results.min(initial=limit))
+
+    def fast_forward(self, ticks: int):
+        self._command(FAST_FORWARD, ticks)
+
+    def stop(self):
+        self.control[:] = STOP, 0
+        try:
+            self.barrier.wait()
+        except BrokenBarrierError:
+            pass
+        for process in self.processes:
+            process.join()